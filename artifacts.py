@@ -0,0 +1,396 @@
+# File: artifacts.py
+
+import os
+import sys
+import json
+import stat
+import time
+import shutil
+import hashlib
+import tempfile
+import argparse
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+from streaming import prune_streams
+
+# Layout of the managed store:
+#   artifacts/objects/<first two hash chars>/<sha256><ext>   content-addressed blobs
+#   artifacts/manifest.json                                   lesson -> artifacts it references
+ARTIFACT_ROOT = "artifacts"
+OBJECTS_DIR = os.path.join(ARTIFACT_ROOT, "objects")
+MANIFEST_PATH = os.path.join(ARTIFACT_ROOT, "manifest.json")
+MANIFEST_LOCK_PATH = os.path.join(ARTIFACT_ROOT, "manifest.lock")
+MEDIA_DIR = "media"
+# Per-job Manim output: media/lessons/<key>-<random>, one directory per render job
+LESSON_MEDIA_DIR = os.path.join(MEDIA_DIR, "lessons")
+# Render files untouched for this long belong to lessons that failed or were abandoned
+STALE_RENDER_HOURS = float(os.getenv("STALE_RENDER_HOURS", 24))
+
+# Pipeline stages store artifacts from several threads at once
+_manifest_lock = threading.Lock()
+
+
+@contextmanager
+def _locked_manifest():
+    """Serialize manifest updates across threads and, where supported, processes"""
+    with _manifest_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(ARTIFACT_ROOT, exist_ok=True)
+        with open(MANIFEST_LOCK_PATH, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def lesson_key(concept, grade_level="middle school"):
+    """Stable key identifying one lesson (concept + grade level) in the manifest"""
+    return f"{concept.replace(' ', '_').lower()}__{grade_level.replace(' ', '_').lower()}"
+
+
+def create_render_dir(key):
+    """
+    Create a fresh Manim media directory for one render job of lesson `key`.
+
+    Jobs never share one, even for the same lesson (a duplicate in a batch, an
+    interactive request while the lesson is queued, warm-up in another process),
+    so they cannot overwrite or delete each other's files.
+    """
+    os.makedirs(LESSON_MEDIA_DIR, exist_ok=True)
+    return tempfile.mkdtemp(dir=LESSON_MEDIA_DIR, prefix=f"{key}-")
+
+
+def remove_render_files(render_dir):
+    """Delete a job's render directory once its final output exists or the render failed"""
+    shutil.rmtree(render_dir, ignore_errors=True)
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def object_path(digest, extension=""):
+    """Path of the stored blob for a digest, sharded by the first two hex chars"""
+    return os.path.join(OBJECTS_DIR, digest[:2], digest + extension)
+
+
+def load_manifest():
+    """Load the manifest, returning an empty one if it does not exist yet"""
+    if not os.path.exists(MANIFEST_PATH):
+        return {"lessons": {}}
+    with open(MANIFEST_PATH, 'r') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest):
+    """Write the manifest atomically so a crash never leaves it half-written"""
+    os.makedirs(ARTIFACT_ROOT, exist_ok=True)
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def _link_or_copy(src, dst):
+    """Hardlink src to dst, falling back to a copy across filesystems"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def detach_output(path):
+    """
+    Remove a working-directory output before the pipeline writes it again.
+
+    Outputs are hardlinks to stored blobs, so rewriting one in place (ffmpeg -y,
+    open(..., 'wb')) would change the blob under every lesson that shares it.
+    """
+    if os.path.lexists(path):
+        os.remove(path)
+
+
+def _same_file(a, b):
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+def store_artifact(path, key, kind, source=None):
+    """
+    Move a pipeline output into the content-addressed store.
+
+    The file is hashed and kept once under artifacts/objects; `path` stays in
+    place as a hardlink to the stored blob, so identical outputs across lessons
+    share disk space. The manifest records that lesson `key` references it.
+
+    Args:
+        path (str): Output file produced by the pipeline (e.g. voiceover_x.mp3).
+        key (str): Lesson key, see lesson_key().
+        kind (str): Artifact kind, e.g. "voiceover" or "final_video".
+        source (str): Content hash of the lesson the artifact was made from,
+            so callers can tell whether it is still current.
+
+    Returns:
+        str: Path of the stored blob, or None if `path` does not exist.
+    """
+    if not os.path.exists(path):
+        print(f"❌ Error: Artifact not found at {path}")
+        return None
+
+    digest = hash_file(path)
+    extension = os.path.splitext(path)[1]
+    blob_path = object_path(digest, extension)
+
+    # Linking happens under the lock so collect_garbage() never sees an unreferenced new blob
+    with _locked_manifest():
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            _link_or_copy(path, blob_path)
+            os.chmod(blob_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        elif not _same_file(path, blob_path):
+            # Same content already stored: replace the output with a link to it
+            tmp_path = path + ".tmp"
+            _link_or_copy(blob_path, tmp_path)
+            os.replace(tmp_path, path)
+
+        manifest = load_manifest()
+        entry = manifest["lessons"].setdefault(key, {})
+        entry[kind] = {
+            "hash": digest,
+            "object": blob_path,
+            "path": path,
+            "size": os.path.getsize(blob_path),
+            "stored_at": time.time(),
+            "source": source,
+        }
+        save_manifest(manifest)
+    return blob_path
+
+
+def lookup_artifact(key, kind):
+    """Return the manifest entry for a lesson's artifact if its blob still exists"""
+    entry = load_manifest()["lessons"].get(key, {}).get(kind)
+    if entry and os.path.exists(entry["object"]):
+        return entry
+    return None
+
+
+def restore_artifact(entry):
+    """
+    Make an artifact's working-directory path point at its blob again; returns the path.
+
+    The path is relinked when it was deleted or now holds a different file
+    (e.g. rewritten by a later run), so callers always get the stored content.
+    """
+    path = entry["path"]
+    if not _same_file(path, entry["object"]):
+        with _locked_manifest():
+            tmp_path = path + ".tmp"
+            _link_or_copy(entry["object"], tmp_path)
+            os.replace(tmp_path, path)
+    return path
+
+
+def _lesson_last_used(artifacts):
+    return max((a["stored_at"] for a in artifacts.values()), default=0)
+
+
+def _drop_lesson(manifest, key):
+    """Remove a lesson from the manifest along with its working-directory links"""
+    for artifact in manifest["lessons"].pop(key, {}).values():
+        # Only remove the output if it is still our link, never a user's edited copy
+        if _same_file(artifact["path"], artifact["object"]):
+            os.remove(artifact["path"])
+
+
+def _tree_stats(path):
+    """Total size and newest modification time of a file or directory tree"""
+    if os.path.isfile(path):
+        return os.path.getsize(path), os.path.getmtime(path)
+    size, newest = 0, os.path.getmtime(path)
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                file_stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            size += file_stat.st_size
+            newest = max(newest, file_stat.st_mtime)
+    return size, newest
+
+
+def prune_partial_movie_files(media_dir=MEDIA_DIR, max_age_hours=STALE_RENDER_HOURS):
+    """
+    Delete Manim's partial_movie_files of finished scenes.
+
+    Manim keeps every per-animation clip it ever rendered there as a cache; the
+    finished scene videos next to them are all the pipeline needs. A scene's
+    clips are only deleted once its video exists and is newer than all of them,
+    so renders still running in this or another process keep theirs. Clips of
+    scenes that never finished go after `max_age_hours` without changes.
+
+    Pipeline render directories under media/lessons are left alone: their
+    static holds are expanded from these clips after the scene video exists,
+    and the whole directory is removed once the job is done.
+
+    Returns:
+        int: Number of bytes freed.
+    """
+    cutoff = time.time() - max_age_hours * 3600
+    freed = 0
+    for root, dirs, files in os.walk(media_dir):
+        if os.path.abspath(root) == os.path.abspath(os.path.join(media_dir, "lessons")):
+            dirs[:] = []
+            continue
+        if os.path.basename(root) != "partial_movie_files":
+            continue
+        dirs[:] = []
+        for scene_name in os.listdir(root):
+            scene_dir = os.path.join(root, scene_name)
+            if not os.path.isdir(scene_dir):
+                continue
+            size, newest = _tree_stats(scene_dir)
+            scene_video = os.path.join(os.path.dirname(root), scene_name + ".mp4")
+            finished = os.path.exists(scene_video) and os.path.getmtime(scene_video) >= newest
+            if finished or newest < cutoff:
+                shutil.rmtree(scene_dir, ignore_errors=True)
+                freed += size
+    return freed
+
+
+def prune_stale_render_files(max_age_hours=STALE_RENDER_HOURS, media_dir=MEDIA_DIR):
+    """
+    Delete render output of lessons that never finished.
+
+    The pipeline removes a job's render directory after muxing; whatever is
+    left under media/lessons and untouched for `max_age_hours` belongs to a
+    failed or abandoned job.
+
+    Returns:
+        int: Number of bytes freed.
+    """
+    lessons_dir = os.path.join(media_dir, "lessons")
+    candidates = []
+    if os.path.isdir(lessons_dir):
+        candidates = [os.path.join(lessons_dir, name) for name in os.listdir(lessons_dir)]
+
+    cutoff = time.time() - max_age_hours * 3600
+    freed = 0
+    for path in candidates:
+        size, newest = _tree_stats(path)
+        if newest >= cutoff:
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+        freed += size
+    return freed
+
+
+def collect_garbage(max_bytes=None, max_age_days=None, prune_media=True):
+    """
+    Enforce the store's size/age budgets and delete unreferenced blobs.
+
+    Lessons older than `max_age_days` are dropped first; then the least recently
+    stored lessons are dropped until the referenced blobs fit in `max_bytes`.
+    Finally any blob no lesson references is deleted, along with the HLS
+    streams of dropped lessons and streams that were superseded or expired.
+
+    Returns:
+        dict: Counts of dropped lessons, deleted objects and bytes freed.
+    """
+    with _locked_manifest():
+        manifest = load_manifest()
+        lessons = manifest["lessons"]
+        dropped = []
+
+        if max_age_days is not None:
+            cutoff = time.time() - max_age_days * 86400
+            for key in [k for k, a in lessons.items() if _lesson_last_used(a) < cutoff]:
+                _drop_lesson(manifest, key)
+                dropped.append(key)
+
+        if max_bytes is not None:
+            def referenced_size():
+                sizes = {a["hash"]: a["size"] for arts in lessons.values() for a in arts.values()}
+                return sum(sizes.values())
+
+            for key in sorted(lessons, key=lambda k: _lesson_last_used(lessons[k])):
+                if referenced_size() <= max_bytes:
+                    break
+                _drop_lesson(manifest, key)
+                dropped.append(key)
+
+        save_manifest(manifest)
+
+        # Still under the lock, so no concurrent store_artifact() can start reusing a blob we delete
+        referenced = {a["object"] for arts in lessons.values() for a in arts.values()}
+        deleted, freed = 0, 0
+        if os.path.isdir(OBJECTS_DIR):
+            for shard in os.listdir(OBJECTS_DIR):
+                shard_dir = os.path.join(OBJECTS_DIR, shard)
+                for name in os.listdir(shard_dir):
+                    blob_path = os.path.join(shard_dir, name)
+                    if blob_path not in referenced:
+                        freed += os.path.getsize(blob_path)
+                        os.remove(blob_path)
+                        deleted += 1
+                if not os.listdir(shard_dir):
+                    os.rmdir(shard_dir)
+
+    # Streams are served straight from disk rather than stored, so they follow their lessons here
+    freed += prune_streams(max_age_days, dropped)
+    if prune_media:
+        freed += prune_partial_movie_files()
+        freed += prune_stale_render_files()
+
+    return {"dropped_lessons": dropped, "deleted_objects": deleted, "freed_bytes": freed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the Musical Math Teacher artifact store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    gc_parser = subparsers.add_parser("gc", help="Delete old or unreferenced artifacts")
+    gc_parser.add_argument("--max-size-mb", type=float, help="Keep stored artifacts under this size")
+    gc_parser.add_argument("--max-age-days", type=float, help="Drop lessons older than this")
+    gc_parser.add_argument("--keep-media", action="store_true",
+                           help="Do not prune Manim partial movie files or stale render output")
+
+    subparsers.add_parser("list", help="Show lessons and the artifacts they reference")
+
+    args = parser.parse_args()
+
+    if args.command == "gc":
+        max_bytes = int(args.max_size_mb * 1024 * 1024) if args.max_size_mb is not None else None
+        result = collect_garbage(max_bytes, args.max_age_days, prune_media=not args.keep_media)
+        print(f"🧹 Dropped {len(result['dropped_lessons'])} lessons, "
+              f"deleted {result['deleted_objects']} objects, "
+              f"freed {result['freed_bytes'] / (1024 * 1024):.1f} MB")
+    elif args.command == "list":
+        for key, artifacts in load_manifest()["lessons"].items():
+            print(f"{key}:")
+            for kind, artifact in artifacts.items():
+                print(f"  {kind}: {artifact['path']} ({artifact['size'] / 1024:.0f} KB, {artifact['hash'][:12]})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+# File: circuit_breaker.py
+
+import os
+import time
+import threading
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# Consecutive failures (or calls slower than BREAKER_SLOW_SECONDS) that trip a breaker
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", 3))
+BREAKER_SLOW_SECONDS = float(os.getenv("BREAKER_SLOW_SECONDS", 60))
+# How long a tripped breaker fast-fails before letting one probe call through
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", 120))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is unavailable, retrying in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider after repeated failures or latency spikes.
+
+    Closed: calls go through. After `failure_threshold` consecutive bad calls
+    the breaker opens and every call fails immediately with CircuitOpenError.
+    Once `reset_seconds` have passed it is half-open: a single probe call goes
+    through, closing the breaker on success or reopening it on failure.
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURES,
+                 slow_call_seconds=BREAKER_SLOW_SECONDS, reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        """Seconds until the breaker lets a probe through (0 when closed)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return 0
+            return max(0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def is_open(self):
+        """True while calls would be rejected without reaching the provider"""
+        return self.retry_after() > 0 or self._probing
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            retry_after = max(0, self.opened_at + self.reset_seconds - time.monotonic())
+            raise CircuitOpenError(self.name, retry_after)
+
+    def _record(self, success):
+        with self._lock:
+            self._probing = False
+            if success:
+                if self.state != CLOSED:
+                    print(f"✅ {self.name} has recovered")
+                self.state = CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state == CLOSED:
+                    print(f"⚡ {self.name} looks down, failing fast for {self.reset_seconds:.0f}s")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def call(self, function, *args, **kwargs):
+        """
+        Call `function` through the breaker.
+
+        A call that raises counts as a failure and the exception propagates; a
+        call that succeeds but takes longer than `slow_call_seconds` still
+        returns its result but counts as a failure too.
+
+        Raises:
+            CircuitOpenError: The breaker is open and the call was not attempted.
+        """
+        self._before_call()
+        start = time.monotonic()
+        try:
+            result = function(*args, **kwargs)
+        except Exception:
+            self._record(success=False)
+            raise
+        self._record(success=time.monotonic() - start <= self.slow_call_seconds)
+        return result
+
+
+GEMINI_BREAKER = CircuitBreaker("Gemini")
+ELEVENLABS_BREAKER = CircuitBreaker("ElevenLabs")
+BREAKERS = [GEMINI_BREAKER, ELEVENLABS_BREAKER]
@@ -2,6 +2,8 @@
 
 import subprocess
 import os
+import json
+import tempfile
 
 def combine_video_and_audio(video_path, audio_path, output_path):
     """
@@ -53,4 +55,318 @@ def combine_video_and_audio(video_path, audio_path, output_path):
         # This catches the error if FFmpeg is not installed or not in the system's PATH
         print("❌ Error: 'ffmpeg' command not found.")
         print("Please ensure FFmpeg is installed and accessible from your terminal.")
-        return None
\ No newline at end of file
+        return None
+
+def get_video_stream_info(path):
+    """
+    Returns the codec, pixel format and time base of a video's first stream
+    using ffprobe, or None on failure.
+    """
+    command = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'stream=codec_name,pix_fmt,time_base',
+        '-of', 'json',
+        path
+    ]
+
+    try:
+        result = subprocess.run(command, check=True, capture_output=True, text=True)
+        return json.loads(result.stdout)["streams"][0]
+
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError, KeyError, IndexError) as e:
+        print(f"❌ Error: Could not read video stream of {path}: {e}")
+        return None
+
+
+def encode_still_clip(frame_path, frame_count, frame_rate, output_path):
+    """
+    Encodes a one-frame video into a clip that shows that frame `frame_count`
+    times, matching the source's codec, resolution, pixel format and time base
+    so it can be joined to it without re-encoding.
+
+    Returns:
+        str: The output path if successful, None otherwise.
+    """
+    info = get_video_stream_info(frame_path)
+    if info is None:
+        return None
+    if info["codec_name"] != "h264":
+        print(f"❌ Error: Static holds need H.264 video, got {info['codec_name']}")
+        return None
+
+    command = [
+        'ffmpeg',
+        '-y',
+        '-i', frame_path,
+        '-vf', f"loop=loop={frame_count - 1}:size=1:start=0,setpts=N/FRAME_RATE/TB",
+        '-r', str(frame_rate),
+        '-frames:v', str(frame_count),
+        '-c:v', 'libx264',   # Same encoder and defaults Manim uses for its partial movie files
+        '-pix_fmt', info["pix_fmt"],
+        '-video_track_timescale', info["time_base"].split('/')[1],
+        output_path
+    ]
+
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True)
+        return output_path
+
+    except subprocess.CalledProcessError as e:
+        print("❌ Error while encoding still clip:")
+        print(f"FFmpeg stderr: {e.stderr}")
+        return None
+
+    except FileNotFoundError:
+        print("❌ Error: 'ffmpeg' command not found.")
+        return None
+
+
+def expand_static_holds(video_path, hold_plan_path, output_path):
+    """
+    Restores the full length of static holds rendered as single frames.
+
+    Manim writes every play()/wait() of a scene as its own partial movie file.
+    The plan names the one-frame partial file of each hold and how many extra
+    copies of its frame to show. Each hold is encoded once as a short still
+    clip; everything else is joined with the concat demuxer as-is, so the
+    animated frames are never decoded or re-encoded.
+
+    Args:
+        video_path (str): Video rendered with HOLD_PLAN_DIR set.
+        hold_plan_path (str): Hold plan JSON written by the scene.
+        output_path (str): Path to save the full-length video.
+
+    Returns:
+        str: The output path (or `video_path` when there is nothing to expand)
+        if successful, None otherwise.
+    """
+    try:
+        with open(hold_plan_path, 'r') as f:
+            plan = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: Could not read hold plan {hold_plan_path}: {e}")
+        return None
+
+    if not plan["holds"]:
+        return video_path
+
+    # Still clips go next to the output, named after it
+    clip_prefix = os.path.splitext(output_path)[0]
+    parts = list(plan["partial_movie_files"])
+    for hold in plan["holds"]:
+        clip_path = f"{clip_prefix}_hold{hold['partial']}.mp4"
+        if not encode_still_clip(parts[hold["partial"]], hold["repeat"] + 1, plan["frame_rate"], clip_path):
+            return None
+        parts[hold["partial"]] = clip_path
+
+    return concatenate_videos([part for part in parts if part], output_path)
+
+
+def concatenate_videos(video_paths, output_path):
+    """
+    Joins videos with identical encoding end to end without re-encoding.
+
+    Args:
+        video_paths (list): Paths of the input videos, in playback order.
+        output_path (str): Path to save the concatenated video.
+
+    Returns:
+        str: The output path if successful, None otherwise.
+    """
+    # The concat demuxer reads its inputs from a list file
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as list_file:
+        for path in video_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            list_file.write(f"file '{escaped}'\n")
+
+    command = [
+        'ffmpeg',
+        '-y',
+        '-f', 'concat',
+        '-safe', '0',
+        '-i', list_file.name,
+        '-c', 'copy',
+        output_path
+    ]
+
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True)
+        return output_path
+
+    except subprocess.CalledProcessError as e:
+        print("❌ Error while concatenating videos:")
+        print(f"FFmpeg stderr: {e.stderr}")
+        return None
+
+    except FileNotFoundError:
+        print("❌ Error: 'ffmpeg' command not found.")
+        return None
+
+    finally:
+        os.remove(list_file.name)
+
+
+def get_media_duration(path):
+    """
+    Returns the duration of a media file in seconds using ffprobe, or None on failure.
+    """
+    command = [
+        'ffprobe',
+        '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        path
+    ]
+
+    try:
+        result = subprocess.run(command, check=True, capture_output=True, text=True)
+        return float(result.stdout.strip())
+
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError) as e:
+        print(f"❌ Error: Could not read duration of {path}: {e}")
+        return None
+
+
+def mux_stream_segment(video_path, audio_path, start, duration, output_path):
+    """
+    Muxes one section video with the matching slice of the voiceover into an
+    MPEG-TS segment for HLS.
+
+    The audio slice starts at `start` seconds into the voiceover and is padded
+    with silence if the voiceover ends early. Timestamps are offset by `start`
+    so consecutive segments play back as one continuous stream.
+
+    Args:
+        video_path (str): Path to the section video (silent).
+        audio_path (str): Path to the full voiceover.
+        start (float): Position of the section in the lesson, in seconds.
+        duration (float): Length of the section video, in seconds.
+        output_path (str): Path to save the .ts segment.
+
+    Returns:
+        str: The output path if successful, None otherwise.
+    """
+    command = [
+        'ffmpeg',
+        '-y',
+        '-i', video_path,
+        '-ss', f"{start:.3f}",
+        '-i', audio_path,
+        '-map', '0:v:0',
+        '-map', '1:a:0',
+        '-c:v', 'copy',      # Section videos are already H.264, no re-encoding needed
+        '-c:a', 'aac',
+        '-af', 'apad',       # Silence after the voiceover ends
+        '-t', f"{duration:.3f}",
+        '-output_ts_offset', f"{start:.3f}",
+        '-f', 'mpegts',
+        output_path
+    ]
+
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True)
+        return output_path
+
+    except subprocess.CalledProcessError as e:
+        print("❌ Error while creating stream segment:")
+        print(f"FFmpeg stderr: {e.stderr}")
+        return None
+
+    except FileNotFoundError:
+        print("❌ Error: 'ffmpeg' command not found.")
+        return None
+
+
+def package_hls(video_path, playlist_path, segment_seconds):
+    """
+    Splits a finished lesson video into an HLS VOD playlist and its segments,
+    written next to the playlist.
+
+    Args:
+        video_path (str): Path to the final lesson video (with audio).
+        playlist_path (str): Path to save the .m3u8 playlist.
+        segment_seconds (int): Target segment length, in seconds.
+
+    Returns:
+        str: The playlist path if successful, None otherwise.
+    """
+    command = [
+        'ffmpeg',
+        '-y',
+        '-i', video_path,
+        '-c', 'copy',        # Already H.264/AAC, segments are cut at keyframes
+        '-f', 'hls',
+        '-hls_time', str(segment_seconds),
+        '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(os.path.dirname(playlist_path), 'segment_%03d.ts'),
+        playlist_path
+    ]
+
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True)
+        return playlist_path
+
+    except subprocess.CalledProcessError as e:
+        print("❌ Error while packaging the stream:")
+        print(f"FFmpeg stderr: {e.stderr}")
+        return None
+
+    except FileNotFoundError:
+        print("❌ Error: 'ffmpeg' command not found.")
+        return None
+
+
+def create_slideshow(image_paths, durations, audio_path, output_path):
+    """
+    Builds a narrated slideshow video from still images and a voiceover.
+
+    Args:
+        image_paths (list): Slide images, in order.
+        durations (list): Seconds to show each slide.
+        audio_path (str): Path to the voiceover.
+        output_path (str): Path to save the video.
+
+    Returns:
+        str: The output path if successful, None otherwise.
+    """
+    # The concat demuxer shows each image for its duration; the last image is
+    # listed twice because its duration is otherwise ignored
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as list_file:
+        for path, duration in zip(image_paths, durations):
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            list_file.write(f"file '{escaped}'\nduration {duration:.3f}\n")
+        escaped = os.path.abspath(image_paths[-1]).replace("'", "'\\''")
+        list_file.write(f"file '{escaped}'\n")
+
+    command = [
+        'ffmpeg',
+        '-y',
+        '-f', 'concat',
+        '-safe', '0',
+        '-i', list_file.name,
+        '-i', audio_path,
+        '-vf', 'fps=5,format=yuv420p',   # Stills need very few frames per second
+        '-c:v', 'libx264',
+        '-tune', 'stillimage',
+        '-c:a', 'aac',
+        '-t', f"{sum(durations):.3f}",
+        output_path
+    ]
+
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True)
+        return output_path
+
+    except subprocess.CalledProcessError as e:
+        print("❌ Error while creating slideshow:")
+        print(f"FFmpeg stderr: {e.stderr}")
+        return None
+
+    except FileNotFoundError:
+        print("❌ Error: 'ffmpeg' command not found.")
+        return None
+
+    finally:
+        os.remove(list_file.name)
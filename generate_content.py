@@ -3,6 +3,8 @@ import os
 import json
 from dotenv import load_dotenv
 
+from circuit_breaker import GEMINI_BREAKER, CircuitOpenError
+
 load_dotenv()
 
 # Configure Gemini
@@ -13,9 +15,15 @@ if not api_key:
 genai.configure(api_key=api_key)
 model = genai.GenerativeModel('gemini-1.5-flash')
 
+# Give up on a single request instead of waiting for the SDK's own retries
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", 90))
+
 def generate_math_lesson(concept, grade_level="middle school"):
     """
     Generate comprehensive math lesson content for various concepts
+
+    If Gemini fails, or its circuit breaker is open, a generic fallback lesson is
+    returned instead, marked with "is_fallback": true and a "fallback_reason".
     """
     
     prompt = f"""
@@ -61,7 +69,9 @@ def generate_math_lesson(concept, grade_level="middle school"):
     """
     
     try:
-        response = model.generate_content(prompt)
+        response = GEMINI_BREAKER.call(
+            model.generate_content, prompt, request_options={"timeout": GEMINI_TIMEOUT_SECONDS}
+        )
         
         # Clean the response to ensure it's valid JSON
         content = response.text.strip()
@@ -74,27 +84,34 @@ def generate_math_lesson(concept, grade_level="middle school"):
         lesson_data = json.loads(content)
         return json.dumps(lesson_data, indent=2)
         
+    except CircuitOpenError as e:
+        print(f"⚡ Skipping Gemini: {e}")
+        fallback_reason = str(e)
     except Exception as e:
         print(f"Error generating lesson with Gemini: {e}")
-        # Return fallback content
-        fallback = {
-            "title": f"Introduction to {concept}",
-            "concept": concept,
-            "grade_level": grade_level,
-            "narrator_script": f"Today we're learning about {concept}. This is an important mathematical concept that helps us solve many real-world problems.",
-            "lyrics": f"🎵 {concept}, {concept}, let's learn it today! Mathematical thinking in a fun, engaging way! 🎵",
-            "key_points": [f"Understanding {concept}", "Key properties", "Real-world applications"],
-            "examples": [
-                {"problem": f"Basic {concept} example", "solution": "Step by step solution", "visual_cue": "Show problem visually"}
-            ],
-            "manim_commands": ["Create title", "Show definition", "Animate example", "Summary"],
-            "difficulty": "beginner",
-            "duration_minutes": 2,
-            "practice_problems": [
-                {"question": f"Practice with {concept}", "answer": "Sample answer"}
-            ]
-        }
-        return json.dumps(fallback, indent=2)
+        fallback_reason = str(e)
+
+    # Return fallback content
+    fallback = {
+        "title": f"Introduction to {concept}",
+        "concept": concept,
+        "grade_level": grade_level,
+        "narrator_script": f"Today we're learning about {concept}. This is an important mathematical concept that helps us solve many real-world problems.",
+        "lyrics": f"🎵 {concept}, {concept}, let's learn it today! Mathematical thinking in a fun, engaging way! 🎵",
+        "key_points": [f"Understanding {concept}", "Key properties", "Real-world applications"],
+        "examples": [
+            {"problem": f"Basic {concept} example", "solution": "Step by step solution", "visual_cue": "Show problem visually"}
+        ],
+        "manim_commands": ["Create title", "Show definition", "Animate example", "Summary"],
+        "difficulty": "beginner",
+        "duration_minutes": 2,
+        "practice_problems": [
+            {"question": f"Practice with {concept}", "answer": "Sample answer"}
+        ],
+        "is_fallback": True,
+        "fallback_reason": fallback_reason
+    }
+    return json.dumps(fallback, indent=2)
 
 def get_math_concepts_by_category():
     """
@@ -121,6 +138,21 @@ def get_math_concepts_by_category():
     }
     return concepts
 
+def find_concept_category(concept, grade_level=None):
+    """
+    Return the catalog category of a concept (e.g. "Calculus"), or None for custom concepts.
+    Concepts listed under several grades (e.g. "Volume") use the category of `grade_level`.
+    """
+    matches = []
+    for grade, categories in get_math_concepts_by_category().items():
+        for category, concept_list in categories.items():
+            if any(c.lower() == concept.lower() for c in concept_list):
+                matches.append((grade, category))
+    for grade, category in matches:
+        if grade_level and grade.lower() == grade_level.lower():
+            return category
+    return matches[0][1] if matches else None
+
 def list_available_concepts():
     """
     Display all available math concepts organized by category
@@ -0,0 +1,272 @@
+# File: lesson_store.py
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+from contextlib import closing
+
+LESSON_DB_PATH = os.getenv("LESSON_DB_PATH", "lessons.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lessons (
+    id INTEGER PRIMARY KEY,
+    concept TEXT NOT NULL,
+    concept_key TEXT NOT NULL,
+    grade_level TEXT NOT NULL,
+    category TEXT,
+    difficulty TEXT,
+    created_at REAL NOT NULL,
+    content_hash TEXT NOT NULL,
+    previous_hash TEXT,
+    changed INTEGER NOT NULL DEFAULT 0,
+    is_fallback INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lessons_concept ON lessons (concept_key, grade_level, created_at);
+CREATE INDEX IF NOT EXISTS idx_lessons_category ON lessons (grade_level, category, created_at);
+CREATE INDEX IF NOT EXISTS idx_lessons_category_only ON lessons (category, created_at);
+CREATE INDEX IF NOT EXISTS idx_lessons_difficulty ON lessons (difficulty, created_at);
+CREATE INDEX IF NOT EXISTS idx_lessons_created ON lessons (created_at);
+CREATE INDEX IF NOT EXISTS idx_lessons_changed ON lessons (created_at) WHERE changed = 1;
+"""
+
+COLUMNS = ("id", "concept", "grade_level", "category", "difficulty", "created_at",
+           "content_hash", "previous_hash", "changed", "is_fallback", "data")
+
+
+def _normalize(text):
+    return text.strip().lower() if text else text
+
+
+def connect(db_path=None):
+    """Open the lesson database, creating the schema on first use"""
+    connection = sqlite3.connect(db_path or LESSON_DB_PATH, timeout=30)
+    # WAL lets pipeline workers write while other threads and processes read
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def serialize_lesson(lesson_data):
+    """Compact, key-sorted JSON, so equal lessons always hash the same"""
+    return json.dumps(lesson_data, separators=(',', ':'), sort_keys=True, ensure_ascii=False)
+
+
+def lesson_hash(lesson_data):
+    """Content hash of a lesson, as stored in the content_hash column"""
+    return hashlib.sha256(serialize_lesson(lesson_data).encode('utf-8')).hexdigest()
+
+
+def _insert(connection, lesson_data, concept, grade_level, category, created_at):
+    data = serialize_lesson(lesson_data)
+    content_hash = hashlib.sha256(data.encode('utf-8')).hexdigest()
+    concept_key = _normalize(concept)
+    grade_level = _normalize(grade_level)
+
+    row = connection.execute(
+        "SELECT content_hash FROM lessons WHERE concept_key = ? AND grade_level = ? "
+        "ORDER BY created_at DESC LIMIT 1",
+        (concept_key, grade_level)
+    ).fetchone()
+    previous_hash = row[0] if row else None
+
+    cursor = connection.execute(
+        "INSERT INTO lessons (concept, concept_key, grade_level, category, difficulty, created_at, "
+        "content_hash, previous_hash, changed, is_fallback, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            concept, concept_key, grade_level, category, _normalize(lesson_data.get('difficulty')),
+            created_at if created_at is not None else time.time(),
+            content_hash, previous_hash, int(previous_hash is not None and previous_hash != content_hash),
+            int(bool(lesson_data.get('is_fallback'))), data,
+        )
+    )
+    return cursor.lastrowid
+
+
+def save_lesson(lesson_data, concept, grade_level, category=None, created_at=None, db_path=None):
+    """
+    Store a new version of a lesson.
+
+    Args:
+        lesson_data (dict): Lesson content as returned by generate_math_lesson().
+        concept (str): Concept the lesson teaches.
+        grade_level (str): Grade level it was generated for.
+        category (str): Catalog category (e.g. "Calculus"), if known.
+        created_at (float): Unix timestamp, defaults to now.
+
+    Returns:
+        int: Row id of the stored lesson.
+    """
+    with closing(connect(db_path)) as connection, connection:
+        return _insert(connection, lesson_data, concept, grade_level, category, created_at)
+
+
+def bulk_insert(lessons, db_path=None):
+    """
+    Store many lessons in a single transaction.
+
+    Args:
+        lessons (iterable): Dicts with "data", "concept", "grade_level" and
+            optionally "category" and "created_at".
+
+    Returns:
+        int: Number of lessons stored.
+    """
+    count = 0
+    with closing(connect(db_path)) as connection, connection:
+        for lesson in lessons:
+            _insert(connection, lesson["data"], lesson["concept"], lesson["grade_level"],
+                    lesson.get("category"), lesson.get("created_at"))
+            count += 1
+    return count
+
+
+def _rows_to_lessons(rows):
+    lessons = []
+    for row in rows:
+        lesson = dict(zip(COLUMNS, row))
+        lesson["data"] = json.loads(lesson["data"])
+        lesson["changed"] = bool(lesson["changed"])
+        lesson["is_fallback"] = bool(lesson["is_fallback"])
+        lessons.append(lesson)
+    return lessons
+
+
+def find_lessons(concept=None, grade_level=None, category=None, difficulty=None,
+                 since=None, changed_only=False, limit=None, db_path=None):
+    """
+    Query stored lessons, newest first. Each filter has an index to search by.
+
+    Args:
+        concept, grade_level, category, difficulty (str): Exact matches (case-insensitive
+            except category).
+        since (float): Only lessons created at or after this Unix timestamp.
+        changed_only (bool): Only versions whose content differs from the previous
+            version of the same concept and grade level.
+        limit (int): Maximum number of lessons to return.
+
+    Returns:
+        list: Lesson dicts with the parsed content under "data".
+    """
+    clauses, params = [], []
+    if concept is not None:
+        clauses.append("concept_key = ?")
+        params.append(_normalize(concept))
+    if grade_level is not None:
+        clauses.append("grade_level = ?")
+        params.append(_normalize(grade_level))
+    if category is not None:
+        clauses.append("category = ?")
+        params.append(category)
+    if difficulty is not None:
+        clauses.append("difficulty = ?")
+        params.append(_normalize(difficulty))
+    if since is not None:
+        clauses.append("created_at >= ?")
+        params.append(since)
+    if changed_only:
+        clauses.append("changed = 1")
+
+    query = f"SELECT {', '.join(COLUMNS)} FROM lessons"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY created_at DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    with closing(connect(db_path)) as connection:
+        return _rows_to_lessons(connection.execute(query, params).fetchall())
+
+
+def latest_lesson(concept, grade_level, db_path=None):
+    """Return the newest stored version of a lesson, or None"""
+    lessons = find_lessons(concept=concept, grade_level=grade_level, limit=1, db_path=db_path)
+    return lessons[0] if lessons else None
+
+
+def export_lessons(path, db_path=None, **filters):
+    """
+    Write lessons matching `filters` (see find_lessons) to a JSON Lines file.
+
+    Returns:
+        int: Number of lessons written.
+    """
+    lessons = find_lessons(db_path=db_path, **filters)
+    with open(path, 'w', encoding='utf-8') as f:
+        for lesson in lessons:
+            f.write(json.dumps(lesson, separators=(',', ':'), ensure_ascii=False) + "\n")
+    return len(lessons)
+
+
+def import_lessons(paths, grade_level="middle school", db_path=None):
+    """
+    Load lessons into the store in one transaction.
+
+    Accepts JSON Lines files written by export_lessons() and the legacy
+    lesson_content_<concept>.json files; the latter carry no category and get
+    `grade_level` unless their content names one.
+
+    Returns:
+        int: Number of lessons stored.
+    """
+    lessons = []
+    for path in paths:
+        if path.endswith(".jsonl"):
+            with open(path, 'r', encoding='utf-8') as f:
+                lessons.extend(json.loads(line) for line in f if line.strip())
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            lessons.append({
+                "data": data,
+                "concept": data.get("concept", os.path.splitext(os.path.basename(path))[0]),
+                "grade_level": data.get("grade_level", grade_level),
+                "created_at": os.path.getmtime(path),
+            })
+    lessons.sort(key=lambda lesson: lesson.get("created_at") or 0)
+    return bulk_insert(lessons, db_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query and maintain the lesson store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    find_parser = subparsers.add_parser("find", help="List stored lessons")
+    find_parser.add_argument("--concept")
+    find_parser.add_argument("--grade-level")
+    find_parser.add_argument("--category")
+    find_parser.add_argument("--difficulty")
+    find_parser.add_argument("--changed", action="store_true", help="Only lessons whose content changed")
+    find_parser.add_argument("--limit", type=int)
+
+    export_parser = subparsers.add_parser("export", help="Export lessons to a JSON Lines file")
+    export_parser.add_argument("path")
+
+    import_parser = subparsers.add_parser("import", help="Import .jsonl exports or lesson_content_*.json files")
+    import_parser.add_argument("paths", nargs="+")
+    import_parser.add_argument("--grade-level", default="middle school")
+
+    args = parser.parse_args()
+
+    if args.command == "find":
+        lessons = find_lessons(args.concept, args.grade_level, args.category, args.difficulty,
+                               changed_only=args.changed, limit=args.limit)
+        for lesson in lessons:
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(lesson["created_at"]))
+            flags = " (fallback)" if lesson["is_fallback"] else ""
+            print(f"{lesson['id']:>5}  {created}  {lesson['grade_level']:<14} {lesson['category'] or '-':<14} "
+                  f"{lesson['concept']}: {lesson['data'].get('title', 'N/A')}{flags}")
+    elif args.command == "export":
+        print(f"✅ Exported {export_lessons(args.path)} lessons to {args.path}")
+    elif args.command == "import":
+        print(f"✅ Imported {import_lessons(args.paths, args.grade_level)} lessons")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,17 @@
 # File: main.py
 
 import os
-import json
 import subprocess
 import sys
+import threading
 from dotenv import load_dotenv
 
 # Import our custom functions
-from generate_content import generate_math_lesson, list_available_concepts, suggest_related_concepts
-from music import generate_voiceover
-from combiner import combine_video_and_audio
+from generate_content import list_available_concepts, suggest_related_concepts
+from pipeline import SCHEDULER, OUTPUT_FORMATS, submit_lesson
+from scheduler import INTERACTIVE, BATCH
+from circuit_breaker import BREAKERS
+from warmup import warm_catalog, report_warmup
 
 # Load API keys from .env file
 load_dotenv()
@@ -36,6 +38,14 @@ def check_dependencies():
         print("❌ FFmpeg not found. Please install FFmpeg and add it to PATH")
         return False
     
+    # Check FFprobe (media durations for streams and slideshows)
+    try:
+        subprocess.run(['ffprobe', '-version'], capture_output=True, check=True)
+        print("✅ FFprobe is installed")
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        print("❌ FFprobe not found. It ships with FFmpeg; make sure it is on PATH too")
+        return False
+    
     # Check Manim
     try:
         subprocess.run(['manim', '--version'], capture_output=True, check=True)
@@ -57,9 +67,11 @@ def get_user_choice():
     print("1. Browse available concepts")
     print("2. Enter a custom concept")
     print("3. Generate lessons for multiple concepts")
-    print("4. Exit")
+    print("4. Show queue status")
+    print("5. Warm up the concept catalog")
+    print("6. Exit")
     
-    choice = input("\nEnter your choice (1-4): ").strip()
+    choice = input("\nEnter your choice (1-6): ").strip()
     return choice
 
 def browse_concepts():
@@ -92,112 +104,79 @@ def browse_concepts():
         print("No exact matches found. Using your input as custom concept.")
         return user_input
 
-def generate_single_lesson(concept, grade_level="middle school"):
-    """Generate a single lesson"""
+def ask_output_format():
+    """Ask which output to produce, defaulting to a single MP4"""
+    output_format = input(f"Output format ({'/'.join(OUTPUT_FORMATS)}) [mp4]: ").strip().lower() or "mp4"
+    if output_format not in OUTPUT_FORMATS:
+        print("Unknown format. Using mp4.")
+        output_format = "mp4"
+    return output_format
+
+def generate_single_lesson(concept, grade_level="middle school", output_format="mp4"):
+    """Generate a single lesson, ahead of any queued batch work"""
     print(f"\n🎯 Generating lesson for: '{concept}'")
     print("-" * 50)
+    print("This may take a few minutes...")
     
-    # Step 1: Generate Content
-    print("📝 Step 1: Generating lesson content with Gemini AI...")
-    try:
-        lesson_json_str = generate_math_lesson(concept, grade_level)
-        lesson_data = json.loads(lesson_json_str)
-        
-        # Save content
-        content_filepath = f"lesson_content_{concept.replace(' ', '_').lower()}.json"
-        with open(content_filepath, 'w') as f:
-            json.dump(lesson_data, f, indent=4)
-        print(f"✅ Content saved to {content_filepath}")
-        
-        # Show lesson preview
-        print(f"\n📋 Lesson Preview:")
-        print(f"Title: {lesson_data.get('title', 'N/A')}")
-        print(f"Duration: {lesson_data.get('duration_minutes', 'N/A')} minutes")
-        print(f"Difficulty: {lesson_data.get('difficulty', 'N/A')}")
-        print(f"Key Points: {', '.join(lesson_data.get('key_points', []))}")
-        
-    except Exception as e:
-        print(f"❌ Error generating content: {e}")
+    job = submit_lesson(concept, grade_level, priority=INTERACTIVE, output_format=output_format)
+    output_video_path = job.wait()
+    if not output_video_path:
+        print(f"❌ Failed to create lesson for '{concept}'")
         return None
     
-    # Step 2: Generate Voiceover
-    print("\n🎤 Step 2: Generating voiceover...")
-    narrator_script = lesson_data.get("narrator_script", "No script available.")
-    voiceover_filepath = f"voiceover_{concept.replace(' ', '_').lower()}.mp3"
+    output_kind = {"hls": "stream", "slides": "slideshow", "audio": "audio"}.get(output_format, "video")
+    print(f"🎉 SUCCESS! Final {output_kind} created: {output_video_path}")
     
-    if generate_voiceover(narrator_script, voiceover_filepath, ELEVENLABS_API_KEY):
-        print(f"✅ Voiceover saved to {voiceover_filepath}")
-    else:
-        print("❌ Failed to generate voiceover")
-        return None
+    # Show lesson summary
+    print(f"\n📊 Lesson Summary:")
+    print(f"Concept: {concept}")
+    print(f"Grade Level: {grade_level}")
+    print(f"Output File: {output_video_path}")
+    print(f"Duration: ~{job.context['lesson_data'].get('duration_minutes', 3)} minutes")
+    if job.context["is_fallback"]:
+        print("⚠️ Gemini was unavailable, so this lesson uses generic fallback content")
     
-    # Step 3: Render Manim Animation
-    print("\n🎬 Step 3: Rendering Manim animation...")
-    print("This may take a few minutes...")
+    # Suggest related concepts
+    related = suggest_related_concepts(concept)
+    if related:
+        print(f"💡 You might also like: {', '.join(related)}")
     
-    try:
-        # Update the lesson content file for Manim to read
-        with open('lesson_content.json', 'w') as f:
-            json.dump(lesson_data, f, indent=4)
-        
-        manim_command = [
-            "manim",
-            "-ql",  # Low quality for faster rendering
-            "musical_math_lesson.py",
-            "MusicalMathLesson"
-        ]
-        
-        result = subprocess.run(manim_command, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            print("✅ Animation rendered successfully")
-        else:
-            print(f"❌ Manim rendering failed: {result.stderr}")
-            return None
-            
-    except Exception as e:
-        print(f"❌ Error during animation rendering: {e}")
-        return None
+    return output_video_path
+
+def report_batch(jobs):
+    """Print which lessons of a batch succeeded once all of them are done"""
+    successful = []
+    fallback = []
+    failed = []
     
-    # Step 4: Find the rendered video
-    video_paths = [
-        os.path.join("media", "videos", "musical_math_lesson", "480p15", "MusicalMathLesson.mp4"),
-        os.path.join("media", "videos", "musical_math_lesson", "720p30", "MusicalMathLesson.mp4"),
-    ]
+    for job in jobs:
+        if not job.wait():
+            failed.append(job.name)
+        elif job.context["is_fallback"]:
+            fallback.append(job.name)
+        else:
+            successful.append(job.name)
     
-    silent_video_path = None
-    for path in video_paths:
-        if os.path.exists(path):
-            silent_video_path = path
-            break
+    # Summary
+    print(f"\n🎉 BATCH COMPLETE!")
+    print(f"✅ Successful: {len(successful)} lessons")
+    print(f"⚠️ Fallback content: {len(fallback)} lessons")
+    print(f"❌ Failed: {len(failed)} lessons")
     
-    if not silent_video_path:
-        print("❌ Could not find rendered video file")
-        return None
+    if successful:
+        print(f"\nSuccessfully created lessons for:")
+        for concept in successful:
+            print(f"  • {concept}")
     
-    # Step 5: Combine Video and Audio
-    print("\n🎵 Step 5: Combining video and audio...")
-    output_video_path = f"final_lesson_{concept.replace(' ', '_').lower()}.mp4"
+    if fallback:
+        print(f"\nCreated with generic fallback content (Gemini unavailable):")
+        for concept in fallback:
+            print(f"  • {concept}")
     
-    if combine_video_and_audio(silent_video_path, voiceover_filepath, output_video_path):
-        print(f"🎉 SUCCESS! Final video created: {output_video_path}")
-        
-        # Show lesson summary
-        print(f"\n📊 Lesson Summary:")
-        print(f"Concept: {concept}")
-        print(f"Grade Level: {grade_level}")
-        print(f"Video File: {output_video_path}")
-        print(f"Duration: ~{lesson_data.get('duration_minutes', 3)} minutes")
-        
-        # Suggest related concepts
-        related = suggest_related_concepts(concept)
-        if related:
-            print(f"💡 You might also like: {', '.join(related)}")
-        
-        return output_video_path
-    else:
-        print("❌ Failed to combine video and audio")
-        return None
+    if failed:
+        print(f"\nFailed to create lessons for:")
+        for concept in failed:
+            print(f"  • {concept}")
 
 def generate_multiple_lessons():
     """Generate lessons for multiple concepts"""
@@ -209,35 +188,45 @@ def generate_multiple_lessons():
         return
     
     grade_level = input("Enter grade level (elementary/middle school/high school) [middle school]: ").strip() or "middle school"
+    output_format = ask_output_format()
+    background = input("Run the batch in the background? (y/n) [n]: ").strip().lower() == 'y'
     
-    print(f"\n🎯 Generating {len(concepts)} lessons...")
+    print(f"\n🎯 Queuing {len(concepts)} lessons...")
+    jobs = [submit_lesson(concept, grade_level, priority=BATCH, output_format=output_format) for concept in concepts]
     
-    successful = []
-    failed = []
+    if background:
+        # Lessons requested meanwhile from the menu are served ahead of this batch
+        threading.Thread(target=report_batch, args=(jobs,), daemon=True).start()
+        print("⏳ Batch is running in the background. Use 'Show queue status' to follow it.")
+    else:
+        report_batch(jobs)
+
+def warm_up_catalog():
+    """Pregenerate the concept catalog in the background, behind interactive lessons"""
+    grades = input("Grade levels to warm, comma separated (elementary/middle school/high school) [all]: ").strip()
+    grade_levels = [g.strip() for g in grades.split(',') if g.strip()] or None
     
-    for i, concept in enumerate(concepts, 1):
-        print(f"\n{'='*20} Lesson {i}/{len(concepts)} {'='*20}")
-        result = generate_single_lesson(concept, grade_level)
-        
-        if result:
-            successful.append(concept)
-        else:
-            failed.append(concept)
+    def run():
+        # Same process and scheduler as the menu, so lessons requested meanwhile go first
+        report_warmup(warm_catalog(grade_levels))
     
-    # Summary
-    print(f"\n🎉 BATCH COMPLETE!")
-    print(f"✅ Successful: {len(successful)} lessons")
-    print(f"❌ Failed: {len(failed)} lessons")
+    threading.Thread(target=run, daemon=True).start()
+    print("⏳ Warm-up is running in the background. Use 'Show queue status' to follow it.")
+
+def show_queue_status():
+    """Print queue depth and wait-time percentiles per stage and priority, and provider health"""
+    def fmt(seconds):
+        return "-" if seconds is None else f"{seconds:.1f}s"
     
-    if successful:
-        print(f"\nSuccessfully created lessons for:")
-        for concept in successful:
-            print(f"  • {concept}")
+    print(f"\n{'Stage':<10} {'Priority':<12} {'Queued':>6} {'Deferred':>8} {'p50':>8} {'p90':>8} {'p99':>8}")
+    for stage, classes in SCHEDULER.stats().items():
+        for priority_name, entry in classes.items():
+            print(f"{stage:<10} {priority_name:<12} {entry['queued']:>6} {entry['deferred']:>8} "
+                  f"{fmt(entry['p50']):>8} {fmt(entry['p90']):>8} {fmt(entry['p99']):>8}")
     
-    if failed:
-        print(f"\nFailed to create lessons for:")
-        for concept in failed:
-            print(f"  • {concept}")
+    print()
+    for breaker in BREAKERS:
+        print(f"{breaker.name}: {breaker.state}")
 
 def main():
     """Main function with enhanced user interaction"""
@@ -255,20 +244,28 @@ def main():
             # Browse concepts
             concept = browse_concepts()
             grade_level = input("Enter grade level (elementary/middle school/high school) [middle school]: ").strip() or "middle school"
-            generate_single_lesson(concept, grade_level)
+            generate_single_lesson(concept, grade_level, ask_output_format())
             
         elif choice == '2':
             # Custom concept
             concept = input("Enter your math concept: ").strip()
             if concept:
                 grade_level = input("Enter grade level (elementary/middle school/high school) [middle school]: ").strip() or "middle school"
-                generate_single_lesson(concept, grade_level)
+                generate_single_lesson(concept, grade_level, ask_output_format())
             
         elif choice == '3':
             # Multiple concepts
             generate_multiple_lessons()
             
         elif choice == '4':
+            # Queue status
+            show_queue_status()
+            
+        elif choice == '5':
+            # Catalog warm-up
+            warm_up_catalog()
+            
+        elif choice == '6':
             print("👋 Thanks for using Musical Math Teacher!")
             break
             
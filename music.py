@@ -4,10 +4,16 @@ import os
 from elevenlabs.client import ElevenLabs
 from elevenlabs import save
 
+from circuit_breaker import ELEVENLABS_BREAKER, CircuitOpenError
+
+# Give up on a single request instead of waiting indefinitely on a stalled API
+ELEVENLABS_TIMEOUT_SECONDS = float(os.getenv("ELEVENLABS_TIMEOUT_SECONDS", 120))
+
 def generate_voiceover(text, filename, api_key):
     """
     Generates an MP3 voiceover from text using the ElevenLabs API.
     This version uses the correct client.generate() method.
+    Fails immediately while the ElevenLabs circuit breaker is open.
     """
     if not api_key:
         print("❌ Error: ElevenLabs API key is not set.")
@@ -17,22 +23,30 @@ def generate_voiceover(text, filename, api_key):
         print(f"🎤 Generating voiceover for: '{text[:40]}...'")
         
         # 1. Initialize the main ElevenLabs client
-        client = ElevenLabs(api_key=api_key)
+        client = ElevenLabs(api_key=api_key, timeout=ELEVENLABS_TIMEOUT_SECONDS)
         
-        # 2. Call the .generate() method DIRECTLY on the client object.
-        # This is the correct syntax.
-        audio = client.generate(
-            text=text,
-            voice="Rachel",
-            model="eleven_multilingual_v2"
-        )
+        def synthesize():
+            # 2. Call the .generate() method DIRECTLY on the client object.
+            # This is the correct syntax.
+            audio = client.generate(
+                text=text,
+                voice="Rachel",
+                model="eleven_multilingual_v2"
+            )
+            
+            # 3. Save the generated audio to the specified file.
+            # The audio is streamed while saving, so this is part of the API call.
+            save(audio, filename)
         
-        # 3. Save the generated audio to the specified file
-        save(audio, filename)
+        ELEVENLABS_BREAKER.call(synthesize)
         
         print(f"✅ Successfully saved voiceover to {filename}")
         return filename
         
+    except CircuitOpenError as e:
+        print(f"⚡ Skipping voiceover: {e}")
+        return None
+        
     except Exception as e:
         print(f"❌ Error during voiceover generation: {e}")
         return None
\ No newline at end of file
@@ -10,46 +10,95 @@ from manim import (
     config
 )
 import json
+import os
 import numpy as np
 import random
 
+# When set, wait() holds are rendered as a single frame and their real length,
+# along with Manim's partial movie files, is written to
+# <HOLD_PLAN_DIR>/<scene name>.json, to be restored afterwards by
+# combiner.expand_static_holds()
+HOLD_PLAN_DIR = os.getenv("HOLD_PLAN_DIR")
+
+# Set for `manim -s` renders: the saved image shows the section at its last hold
+# rather than the empty frame left after the closing fade-out
+SLIDES_MODE = os.getenv("SLIDES_MODE") == "1"
+
+# renderer.py points each render at its lesson's own content file
+LESSON_CONTENT_PATH = os.getenv("LESSON_CONTENT_PATH", "lesson_content.json")
+
 try:
-    with open('lesson_content.json', 'r') as f:
+    with open(LESSON_CONTENT_PATH, 'r') as f:
         script_data = json.load(f)
 except FileNotFoundError:
-    print("Error: lesson_content.json not found. Please run main.py first.")
+    print(f"Error: {LESSON_CONTENT_PATH} not found. Please run main.py first.")
     script_data = {
         "title": "Math Lesson", "concept": "Error", "narrator_script": "Error.",
         "lyrics": "Error.", "key_points": [], "examples": [], "difficulty": "beginner"
     }
 
 class MusicalMathLesson(Scene):
-    def construct(self):
+    def setup(self):
+        self.static_holds = []
+        self.slide = None
         self.camera.background_color = "#0f0f23"
         difficulty = script_data.get('difficulty', 'beginner')
         
         # --- CORRECTED COLOR ASSIGNMENTS ---
         if difficulty == 'beginner':
-            primary_color, secondary_color, accent_color = GREEN, GREEN_B, YELLOW
+            self.primary_color, self.secondary_color, self.accent_color = GREEN, GREEN_B, YELLOW
         elif difficulty == 'intermediate':
-            primary_color, secondary_color, accent_color = BLUE, BLUE_B, ORANGE
+            self.primary_color, self.secondary_color, self.accent_color = BLUE, BLUE_B, ORANGE
         else:
-            primary_color, secondary_color, accent_color = PURPLE, PURPLE_B, RED
-        
-        self.create_title_animation(primary_color, accent_color)
-        self.introduce_concept(primary_color)
-        self.display_key_points(primary_color)
-        self.animate_examples(primary_color, secondary_color)
-        self.musical_section(accent_color)
-        self.create_summary(primary_color)
-        self.create_end_screen(primary_color, accent_color)
+            self.primary_color, self.secondary_color, self.accent_color = PURPLE, PURPLE_B, RED
+
+    def hold(self, duration):
+        """Hold the current frame; in static-hold mode only one frame is rendered"""
+        if SLIDES_MODE:
+            self.slide = [mobject.copy() for mobject in self.mobjects]
+        if not HOLD_PLAN_DIR:
+            self.wait(duration)
+            return
+        frame_rate = config.frame_rate
+        # Every play()/wait() becomes its own partial movie file; remember which one is this hold
+        partial_index = self.renderer.num_plays
+        self.wait(1 / frame_rate)
+        extra_frames = round(duration * frame_rate) - 1
+        if extra_frames > 0:
+            self.static_holds.append({"partial": partial_index, "repeat": extra_frames})
+
+    def tear_down(self):
+        if SLIDES_MODE and self.slide is not None:
+            self.clear()
+            self.add(*self.slide)
+        if HOLD_PLAN_DIR:
+            plan_path = os.path.join(HOLD_PLAN_DIR, f"{type(self).__name__}.json")
+            partial_movie_files = [
+                os.path.abspath(path) if path else None
+                for path in self.renderer.file_writer.partial_movie_files
+            ]
+            with open(plan_path, 'w') as f:
+                json.dump({
+                    "frame_rate": config.frame_rate,
+                    "partial_movie_files": partial_movie_files,
+                    "holds": self.static_holds,
+                }, f)
+
+    def construct(self):
+        self.create_title_animation(self.primary_color, self.accent_color)
+        self.introduce_concept(self.primary_color)
+        self.display_key_points(self.primary_color)
+        self.animate_examples(self.primary_color, self.secondary_color)
+        self.musical_section(self.accent_color)
+        self.create_summary(self.primary_color)
+        self.create_end_screen(self.primary_color, self.accent_color)
 
     def create_title_animation(self, primary_color, accent_color):
         title = Text(script_data['title'], font_size=60, color=primary_color).to_edge(UP, buff=1)
         subtitle = Text(f"Learning: {script_data['concept']}", font_size=32, color=accent_color).next_to(title, DOWN)
         self.play(DrawBorderThenFill(title))
         self.play(FadeIn(subtitle, shift=UP))
-        self.wait(1)
+        self.hold(1)
         self.play(FadeOut(title, shift=UP), FadeOut(subtitle, shift=UP))
 
     def introduce_concept(self, primary_color):
@@ -59,7 +108,7 @@ class MusicalMathLesson(Scene):
         explanation = Paragraph(intro_text, font_size=24, color=WHITE, width=config.frame_width - 2, alignment="center").next_to(title, DOWN, buff=1)
         self.play(Write(title))
         self.play(FadeIn(explanation, shift=UP))
-        self.wait(3)
+        self.hold(3)
         self.play(FadeOut(title), FadeOut(explanation))
 
     def display_key_points(self, primary_color):
@@ -78,7 +127,7 @@ class MusicalMathLesson(Scene):
 
         for bullet in bullets:
             self.play(FadeIn(bullet, shift=LEFT))
-        self.wait(2)
+        self.hold(2)
         self.play(FadeOut(title), FadeOut(bullets))
 
     def animate_examples(self, primary_color, secondary_color):
@@ -89,7 +138,7 @@ class MusicalMathLesson(Scene):
         title = Text(f"Example {num}", font_size=40, color=primary_color).to_edge(UP, buff=0.5)
         problem = Text(example['problem'], font_size=32, color=WHITE).next_to(title, DOWN, buff=1)
         self.play(Write(title), FadeIn(problem, shift=UP))
-        self.wait(1)
+        self.hold(1)
         solution_group = VGroup()
         for i, line in enumerate(example['solution'].split('\n')[:3]):
             if line.strip():
@@ -102,7 +151,7 @@ class MusicalMathLesson(Scene):
         for step in solution_group: self.play(Write(step))
         checkmark = Text("✓", font_size=48, color=GREEN).next_to(solution_group, DOWN, buff=0.5)
         self.play(GrowFromCenter(checkmark))
-        self.wait(2)
+        self.hold(2)
         self.play(FadeOut(title), FadeOut(problem), FadeOut(solution_group), FadeOut(checkmark))
 
     def musical_section(self, accent_color):
@@ -113,7 +162,7 @@ class MusicalMathLesson(Scene):
         self.play(LaggedStart(*[FadeIn(n) for n in notes], lag_ratio=0.2))
         self.play(FadeIn(lyrics_text, shift=UP))
         self.play(Rotate(notes, angle=2*PI, run_time=3))
-        self.wait(1)
+        self.hold(1)
         self.play(FadeOut(notes), FadeOut(lyrics_text))
 
     def create_summary(self, primary_color):
@@ -128,7 +177,7 @@ class MusicalMathLesson(Scene):
             items.add(item)
         self.play(Write(title))
         self.play(LaggedStart(*[FadeIn(item, shift=LEFT) for item in items], lag_ratio=0.3))
-        self.wait(2)
+        self.hold(2)
         self.play(FadeOut(title), FadeOut(items))
 
     def create_end_screen(self, primary_color, accent_color):
@@ -136,4 +185,44 @@ class MusicalMathLesson(Scene):
         keep_learning = Text("Keep exploring mathematics!", font_size=32, color=accent_color).next_to(thank_you, DOWN)
         self.play(DrawBorderThenFill(thank_you))
         self.play(FadeIn(keep_learning, shift=UP))
-        self.wait(2)
\ No newline at end of file
+        self.hold(2)
+
+
+# --- SECTION SCENES ---
+# Every section of MusicalMathLesson ends with everything faded out, so each one
+# can be rendered as its own scene and the videos concatenated in order.
+# renderer.lesson_sections() decides which of these a lesson needs.
+
+class TitleSection(MusicalMathLesson):
+    def construct(self):
+        self.create_title_animation(self.primary_color, self.accent_color)
+
+class IntroSection(MusicalMathLesson):
+    def construct(self):
+        self.introduce_concept(self.primary_color)
+
+class KeyPointsSection(MusicalMathLesson):
+    def construct(self):
+        self.display_key_points(self.primary_color)
+
+class Example1Section(MusicalMathLesson):
+    example_index = 0
+
+    def construct(self):
+        example = script_data['examples'][self.example_index]
+        self.animate_single_example(example, self.primary_color, self.secondary_color, self.example_index + 1)
+
+class Example2Section(Example1Section):
+    example_index = 1
+
+class MusicalSection(MusicalMathLesson):
+    def construct(self):
+        self.musical_section(self.accent_color)
+
+class SummarySection(MusicalMathLesson):
+    def construct(self):
+        self.create_summary(self.primary_color)
+
+class EndScreenSection(MusicalMathLesson):
+    def construct(self):
+        self.create_end_screen(self.primary_color, self.accent_color)
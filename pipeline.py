@@ -0,0 +1,383 @@
+# File: pipeline.py
+
+import os
+import json
+import time
+from dotenv import load_dotenv
+
+from generate_content import generate_math_lesson, find_concept_category
+from music import generate_voiceover
+from combiner import combine_video_and_audio, create_slideshow, get_media_duration
+from renderer import render_lesson, render_lesson_slides, section_text, MEMORY_BUDGET
+from streaming import HlsPublisher, published_stream, publish_video
+from artifacts import (lesson_key, store_artifact, lookup_artifact, restore_artifact, detach_output,
+                       create_render_dir, remove_render_files)
+from lesson_store import save_lesson, latest_lesson, lesson_hash
+from scheduler import PipelineScheduler, Job, Deferred, INTERACTIVE, BATCH
+from circuit_breaker import GEMINI_BREAKER, ELEVENLABS_BREAKER
+
+load_dotenv()
+ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
+
+# Render wait() holds as single frames and expand them with FFmpeg afterwards
+STATIC_HOLDS = os.getenv("STATIC_HOLDS", "1") != "0"
+
+# Worker threads per stage. The render stage has no workers of its own: every
+# lesson starts rendering at once and its sections are admitted in priority
+# order by renderer.RENDER_WORKERS and the render memory budget.
+CONTENT_WORKERS = int(os.getenv("CONTENT_WORKERS", 2))
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", 2))
+MUX_WORKERS = int(os.getenv("MUX_WORKERS", 2))
+SLIDESHOW_WORKERS = int(os.getenv("SLIDESHOW_WORKERS", 2))
+
+# Batch lessons hit by a provider failure retry their stage later, at most
+# MAX_DEFERRALS times, instead of failing or settling for fallback content
+MAX_DEFERRALS = int(os.getenv("MAX_DEFERRALS", 5))
+RETRY_DELAY_SECONDS = float(os.getenv("RETRY_DELAY_SECONDS", 30))
+
+# Outputs are named by lesson key, since a concept can appear in several grades.
+# "mp4": one final_lesson_<lesson key>.mp4 once everything is done.
+# "hls": streams/<lesson key>/index.m3u8 once complete; while rendering, a new stream
+#        directory grows section by section and replaces it at the end.
+# "slides": slides_lesson_<lesson key>.mp4, one still per section over the voiceover.
+# "audio": the voiceover plus transcript_<lesson key>.txt, no rendering at all.
+OUTPUT_FORMATS = ("mp4", "hls", "slides", "audio")
+
+# Stored lessons younger than this are reused instead of calling Gemini again
+CACHE_MAX_AGE_DAYS = float(os.getenv("CACHE_MAX_AGE_DAYS", 30))
+
+
+def fresh_lesson(concept, grade_level):
+    """Latest stored lesson if it is recent and not fallback content, else None"""
+    lesson = latest_lesson(concept, grade_level)
+    if lesson and not lesson["is_fallback"] and time.time() - lesson["created_at"] < CACHE_MAX_AGE_DAYS * 86400:
+        return lesson
+    return None
+
+
+def cached_artifact(key, kind, content_hash):
+    """Path of a stored artifact made from this exact lesson content, else None"""
+    entry = lookup_artifact(key, kind)
+    if entry and entry.get("source") == content_hash:
+        return restore_artifact(entry)
+    return None
+
+
+def cached_lesson_video(concept, grade_level):
+    """
+    Final video of a fresh stored lesson, if one was already produced.
+
+    Returns:
+        tuple: (lesson, video path), or None when anything would have to be generated.
+    """
+    lesson = fresh_lesson(concept, grade_level)
+    if not lesson:
+        return None
+    video_path = cached_artifact(lesson_key(concept, grade_level), "final_video", lesson["content_hash"])
+    return (lesson, video_path) if video_path else None
+
+
+def cached_lesson_stream(concept, grade_level):
+    """
+    Complete stream of a fresh stored lesson, published from its final video if
+    only that exists yet.
+
+    Returns:
+        tuple: (lesson, playlist path), or None when anything would have to be rendered.
+    """
+    lesson = fresh_lesson(concept, grade_level)
+    if not lesson:
+        return None
+    key = lesson_key(concept, grade_level)
+    playlist_path = published_stream(key, lesson["content_hash"])
+    if not playlist_path:
+        video_path = cached_artifact(key, "final_video", lesson["content_hash"])
+        playlist_path = publish_video(key, video_path, lesson["content_hash"]) if video_path else None
+    return (lesson, playlist_path) if playlist_path else None
+
+
+def _defer_batch(ctx, breaker):
+    """Park a batch lesson until `breaker`'s provider may be back; interactive lessons never wait"""
+    if ctx["priority"] != BATCH or ctx["deferrals"] >= MAX_DEFERRALS:
+        return
+    ctx["deferrals"] += 1
+    raise Deferred(max(breaker.retry_after(), RETRY_DELAY_SECONDS), f"{breaker.name} is unavailable")
+
+
+def write_transcript(lesson_data, path):
+    """Write the narration, key points and lyrics of a lesson as plain text"""
+    lines = [lesson_data.get('title', 'Math Lesson'), "=" * len(lesson_data.get('title', 'Math Lesson')), ""]
+    lines += ["Narration:", lesson_data.get('narrator_script', ''), ""]
+    if lesson_data.get('key_points'):
+        lines.append("Key Points:")
+        lines += [f"  • {point}" for point in lesson_data['key_points']]
+        lines.append("")
+    if lesson_data.get('lyrics'):
+        lines += ["Lyrics:", lesson_data['lyrics'], ""]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+    return path
+
+
+def slide_durations(lesson_data, sections, total_duration):
+    """Split the voiceover length across slides, giving wordier sections more time"""
+    weights = [1 + len(section_text(lesson_data, section)) / 100 for section in sections]
+    return [total_duration * weight / sum(weights) for weight in weights]
+
+
+def content_stage(ctx):
+    """Step 1: generate the lesson content with Gemini"""
+    concept, grade_level = ctx["concept"], ctx["grade_level"]
+    if ctx["use_cache"]:
+        lesson = fresh_lesson(concept, grade_level)
+        if lesson:
+            print(f"♻️ [{concept}] Reusing stored lesson content (id {lesson['id']})")
+            ctx["lesson_data"] = lesson["data"]
+            ctx["content_hash"] = lesson["content_hash"]
+            return True
+
+    if GEMINI_BREAKER.is_open():
+        _defer_batch(ctx, GEMINI_BREAKER)
+    print(f"📝 [{concept}] Generating lesson content with Gemini AI...")
+    lesson_data = json.loads(generate_math_lesson(concept, grade_level))
+    
+    if lesson_data.get("is_fallback"):
+        _defer_batch(ctx, GEMINI_BREAKER)
+        print(f"⚠️ [{concept}] Using generic fallback content: {lesson_data.get('fallback_reason')}")
+        ctx["is_fallback"] = True
+
+    lesson_id = save_lesson(lesson_data, concept, grade_level, find_concept_category(concept, grade_level))
+    print(f"✅ [{concept}] Content saved to the lesson store (id {lesson_id})")
+
+    if ctx["priority"] == INTERACTIVE:
+        print(f"\n📋 Lesson Preview:")
+        print(f"Title: {lesson_data.get('title', 'N/A')}")
+        print(f"Duration: {lesson_data.get('duration_minutes', 'N/A')} minutes")
+        print(f"Difficulty: {lesson_data.get('difficulty', 'N/A')}")
+        print(f"Key Points: {', '.join(lesson_data.get('key_points', []))}")
+
+    ctx["lesson_data"] = lesson_data
+    ctx["content_hash"] = lesson_hash(lesson_data)
+    return True
+
+
+def voiceover_stage(ctx):
+    """Step 2: narrate the script with ElevenLabs"""
+    concept = ctx["concept"]
+    if ctx["use_cache"]:
+        voiceover_filepath = cached_artifact(ctx["key"], "voiceover", ctx["content_hash"])
+        if voiceover_filepath:
+            print(f"♻️ [{concept}] Reusing voiceover {voiceover_filepath}")
+            ctx["voiceover_path"] = voiceover_filepath
+            return True
+
+    if ELEVENLABS_BREAKER.is_open():
+        _defer_batch(ctx, ELEVENLABS_BREAKER)
+    print(f"🎤 [{concept}] Generating voiceover...")
+    narrator_script = ctx["lesson_data"].get("narrator_script", "No script available.")
+    voiceover_filepath = f"voiceover_{ctx['key']}.mp3"
+    detach_output(voiceover_filepath)
+
+    if not generate_voiceover(narrator_script, voiceover_filepath, ELEVENLABS_API_KEY):
+        _defer_batch(ctx, ELEVENLABS_BREAKER)
+        print(f"❌ [{concept}] Failed to generate voiceover")
+        return False
+
+    store_artifact(voiceover_filepath, ctx["key"], "voiceover", source=ctx["content_hash"])
+    ctx["voiceover_path"] = voiceover_filepath
+    return True
+
+
+def render_stage(ctx):
+    """Step 3: render the Manim animation, one process per section"""
+    concept, key = ctx["concept"], ctx["key"]
+    print(f"🎬 [{concept}] Rendering Manim animation...")
+
+    streaming = ctx["output_format"] == "hls"
+    on_section_ready = None
+    if streaming:
+        # Segments are published while the remaining sections still render
+        ctx["publisher"] = HlsPublisher(key, ctx["voiceover_path"], ctx["content_hash"])
+        on_section_ready = ctx["publisher"].add_section
+        print(f"📡 [{concept}] Streaming to {ctx['publisher'].playlist_path}")
+
+    # Each job renders in its own media directory so concurrent jobs, even for
+    # the same lesson, never share lesson content files, hold plans or scene outputs
+    ctx["render_dir"] = create_render_dir(key)
+    silent_video_path = None
+    try:
+        silent_video_path = render_lesson(
+            ctx["lesson_data"],
+            # A stream is made of the section videos, so they are never joined
+            None if streaming else os.path.join(ctx["render_dir"], "lesson.mp4"),
+            quality="-ql",  # Low quality for faster rendering
+            media_dir=ctx["render_dir"],
+            static_holds=STATIC_HOLDS,
+            priority=ctx["priority"],
+            on_section_ready=on_section_ready,
+            deadline=ctx["deadline"]
+        )
+    finally:
+        # End the stream whatever happened, or players would poll it forever.
+        # Only a complete stream replaces the lesson's current one.
+        if streaming:
+            ctx["result"] = ctx["publisher"].finish(complete=bool(silent_video_path))
+
+    if not silent_video_path:
+        print(f"❌ [{concept}] Manim rendering failed")
+        remove_render_files(ctx["render_dir"])
+        ctx["result"] = None
+        return False
+
+    print(f"✅ [{concept}] Animation rendered successfully")
+    if streaming:
+        remove_render_files(ctx["render_dir"])
+        return True
+    ctx["silent_video_path"] = silent_video_path
+    return True
+
+
+def mux_stage(ctx):
+    """Step 4: combine the rendered animation with the voiceover"""
+    concept = ctx["concept"]
+    output_video_path = f"final_lesson_{ctx['key']}.mp4"
+    detach_output(output_video_path)
+
+    combined = combine_video_and_audio(ctx["silent_video_path"], ctx["voiceover_path"], output_video_path)
+    # Section videos, hold plans and the silent video are only needed until now
+    remove_render_files(ctx["render_dir"])
+    if not combined:
+        print(f"❌ [{concept}] Failed to combine video and audio")
+        return False
+
+    store_artifact(output_video_path, ctx["key"], "final_video", source=ctx["content_hash"])
+    ctx["result"] = output_video_path
+    return True
+
+
+def slides_stage(ctx):
+    """Slides step 3: render one still per section"""
+    concept = ctx["concept"]
+    print(f"🖼️ [{concept}] Rendering slides...")
+    ctx["render_dir"] = create_render_dir(ctx["key"])
+    slides = render_lesson_slides(
+        ctx["lesson_data"],
+        quality="-ql",
+        media_dir=ctx["render_dir"],
+        priority=ctx["priority"],
+        deadline=ctx["deadline"]
+    )
+    if not slides:
+        print(f"❌ [{concept}] Slide rendering failed")
+        remove_render_files(ctx["render_dir"])
+        return False
+    ctx["slides"] = slides
+    return True
+
+
+def slideshow_stage(ctx):
+    """Slides step 4: show the stills over the voiceover"""
+    concept = ctx["concept"]
+    total_duration = get_media_duration(ctx["voiceover_path"])
+    if total_duration is None:
+        remove_render_files(ctx["render_dir"])
+        return False
+    sections, images = zip(*ctx["slides"])
+    durations = slide_durations(ctx["lesson_data"], sections, total_duration)
+    slides_path = f"slides_lesson_{ctx['key']}.mp4"
+    detach_output(slides_path)
+    created = create_slideshow(list(images), durations, ctx["voiceover_path"], slides_path)
+    remove_render_files(ctx["render_dir"])
+    if not created:
+        print(f"❌ [{concept}] Failed to create slideshow")
+        return False
+    store_artifact(slides_path, ctx["key"], "slides_video", source=ctx["content_hash"])
+    ctx["result"] = slides_path
+    return True
+
+
+def transcript_stage(ctx):
+    """Audio step 3: write the transcript next to the voiceover"""
+    concept = ctx["concept"]
+    transcript_path = f"transcript_{ctx['key']}.txt"
+    detach_output(transcript_path)
+    write_transcript(ctx["lesson_data"], transcript_path)
+    store_artifact(transcript_path, ctx["key"], "transcript", source=ctx["content_hash"])
+    print(f"📝 [{concept}] Transcript saved to {transcript_path}")
+    ctx["result"] = ctx["voiceover_path"]
+    return True
+
+
+# Slides and transcripts have their own stages, so audio-only and slides
+# lessons never queue behind full video renders or muxes. Render and slide
+# jobs queue in the render memory budget, so that is what their stats show.
+SCHEDULER = PipelineScheduler([
+    ("content", content_stage, CONTENT_WORKERS),
+    ("tts", voiceover_stage, TTS_WORKERS),
+    ("render", render_stage, None),
+    ("mux", mux_stage, MUX_WORKERS),
+    ("slides", slides_stage, None),
+    ("slideshow", slideshow_stage, SLIDESHOW_WORKERS),
+    ("transcript", transcript_stage, None),
+], admission_stats={
+    "render": lambda: MEMORY_BUDGET.stats("render"),
+    "slides": lambda: MEMORY_BUDGET.stats("slides"),
+})
+
+# Stages each output format goes through
+FORMAT_ROUTES = {
+    "mp4": ("content", "tts", "render", "mux"),
+    "hls": ("content", "tts", "render"),
+    "slides": ("content", "tts", "slides", "slideshow"),
+    "audio": ("content", "tts", "transcript"),
+}
+
+
+def submit_lesson(concept, grade_level="middle school", priority=BATCH, deadline_seconds=None, use_cache=True,
+                  output_format="mp4"):
+    """
+    Queue a lesson for generation.
+
+    With `use_cache`, a lesson whose final video already exists for its current
+    stored content completes immediately without being queued, and queued
+    lessons reuse stored content and voiceovers where they are still fresh.
+    A stream is reused, or packaged from the final video, the same way; slides
+    and transcripts are always rebuilt from the (cached) voiceover.
+
+    Args:
+        concept (str): Math concept to teach.
+        grade_level (str): Target grade level.
+        priority (int): scheduler.INTERACTIVE for on-demand lessons, scheduler.BATCH otherwise.
+        deadline_seconds (float): Drop the lesson if it is still queued after this long.
+        use_cache (bool): Reuse fresh stored content, voiceovers and videos.
+        output_format (str): One of OUTPUT_FORMATS.
+
+    Returns:
+        scheduler.Job: Job whose result is the final video (or playlist) path, or None on failure.
+    """
+    context = {
+        "concept": concept,
+        "grade_level": grade_level,
+        "key": lesson_key(concept, grade_level),
+        "priority": priority,
+        # Also orders this lesson's section renders within the memory budget
+        "deadline": time.monotonic() + deadline_seconds if deadline_seconds is not None else None,
+        "deferrals": 0,
+        "is_fallback": False,
+        "use_cache": use_cache,
+        "output_format": output_format,
+    }
+
+    result = None
+    if use_cache and output_format == "mp4":
+        result = cached_lesson_video(concept, grade_level)
+    elif use_cache and output_format == "hls":
+        result = cached_lesson_stream(concept, grade_level)
+    if result:
+        lesson, path = result
+        context.update(lesson_data=lesson["data"], content_hash=lesson["content_hash"], result=path)
+        job = Job(concept, context, priority, None)
+        job.finish(result=path)
+        return job
+
+    return SCHEDULER.submit(concept, context, priority, deadline_seconds, FORMAT_ROUTES[output_format])
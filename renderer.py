@@ -0,0 +1,580 @@
+# File: renderer.py
+
+import os
+import json
+import glob
+import time
+import heapq
+import itertools
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows: the budget and history are shared by threads of one process only
+    fcntl = None
+
+from combiner import expand_static_holds, concatenate_videos
+from scheduler import BATCH, PRIORITY_NAMES, WAIT_SAMPLES, wait_percentiles
+
+SCENE_FILE = "musical_math_lesson.py"
+
+# Number of sections rendered at once across all lessons; each one is its own Manim process
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", os.cpu_count() or 1))
+
+# Baseline peak memory (MB) of one Manim process per quality flag, before text
+# content. Scaled by factors learned from measured renders, see estimate_render_memory()
+BASE_MEMORY_MB = {"-ql": 350, "-qm": 450, "-qh": 700, "-qp": 900, "-qk": 1500}
+MEMORY_PER_KCHAR_MB = 40
+MEMORY_HISTORY_PATH = os.path.join("media", "render_memory.json")
+MEMORY_HISTORY_LIMIT = 500
+MEMORY_SAMPLE_INTERVAL = 0.25
+
+# Reservations of every process rendering from this working directory (the
+# CLI, warmup.py, ...), so together they stay within one budget
+SHARED_BUDGET_PATH = os.path.join("media", "render_budget.json")
+# How often a waiting job rechecks reservations released by other processes
+SHARED_BUDGET_POLL_SECONDS = 1.0
+
+
+def _default_memory_budget_mb():
+    """Half of physical memory, or 4 GB where /proc/meminfo is unavailable"""
+    try:
+        with open("/proc/meminfo", 'r') as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) // 1024 // 2
+    except OSError:
+        pass
+    return 4096
+
+
+RENDER_MEMORY_BUDGET_MB = int(os.getenv("RENDER_MEMORY_BUDGET_MB", _default_memory_budget_mb()))
+
+
+@contextmanager
+def _locked_file(lock_path):
+    """Hold an exclusive flock on `lock_path` where supported"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    with open(lock_path, 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class MemoryBudget:
+    """
+    Admits render jobs only while their reserved memory fits the budget.
+
+    At most `max_jobs` renders run at once. Waiting jobs are admitted strictly
+    in (priority, deadline, arrival) order, so sections of an interactive
+    lesson start before queued batch sections, and sooner deadlines first
+    within a class. A job that alone exceeds the budget is still
+    admitted once nothing else is running, so oversized lessons render serially
+    instead of never.
+
+    With `shared_path`, each process also publishes its reservations in that
+    file (under an flock) and counts those of other live processes against the
+    budget, so several processes on one host share it. Priority order only
+    applies within a process.
+    """
+
+    def __init__(self, budget_mb, max_jobs, shared_path=None):
+        self.budget_mb = budget_mb
+        self.max_jobs = max_jobs
+        self.shared_path = shared_path if fcntl else None
+        self.reserved_mb = 0
+        self.running = 0
+        self._waiting = []
+        self._waits = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def _shared(self):
+        """Lock the shared reservations and yield those of other live processes"""
+        if not self.shared_path:
+            yield {}
+            return
+        with _locked_file(self.shared_path + ".lock"):
+            try:
+                with open(self.shared_path, 'r') as f:
+                    reservations = json.load(f)
+            except (OSError, ValueError):
+                reservations = {}
+            others = {
+                pid: entry for pid, entry in reservations.items()
+                if int(pid) != os.getpid() and _process_alive(int(pid))
+            }
+            yield others
+
+            if self.running:
+                others[str(os.getpid())] = {"mb": self.reserved_mb, "jobs": self.running}
+            tmp_path = self.shared_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(others, f)
+            os.replace(tmp_path, self.shared_path)
+
+    def _fits(self, amount_mb, others):
+        running = self.running + sum(entry["jobs"] for entry in others.values())
+        if not running:
+            return True
+        reserved_mb = self.reserved_mb + sum(entry["mb"] for entry in others.values())
+        return running < self.max_jobs and reserved_mb + amount_mb <= self.budget_mb
+
+    def acquire(self, amount_mb, priority=BATCH, cancel=None, deadline=None, label="render"):
+        """
+        Wait until `amount_mb` fits, then reserve it.
+
+        Args:
+            cancel (threading.Event): Give up waiting once it is set.
+            deadline (float): time.monotonic() deadline of the job, if any.
+            label (str): Kind of render, for stats().
+
+        Returns:
+            bool: True once reserved, False if cancelled while waiting.
+        """
+        with self._condition:
+            queued_at = time.monotonic()
+            ticket = (priority, deadline if deadline is not None else float('inf'), next(self._sequence), label)
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                if cancel is not None and cancel.is_set():
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    # Whoever was queued behind us may be first in line now
+                    self._condition.notify_all()
+                    return False
+                if self._waiting[0] == ticket:
+                    with self._shared() as others:
+                        if self._fits(amount_mb, others):
+                            heapq.heappop(self._waiting)
+                            self.reserved_mb += amount_mb
+                            self.running += 1
+                            break
+                # Other processes and cancel events cannot notify us, so poll for them
+                polling = self.shared_path or cancel is not None
+                self._condition.wait(SHARED_BUDGET_POLL_SECONDS if polling else None)
+            samples = self._waits.setdefault((label, priority), deque(maxlen=WAIT_SAMPLES))
+            samples.append(time.monotonic() - queued_at)
+            # The next job in line may fit as well
+            self._condition.notify_all()
+            return True
+
+    def resize(self, old_mb, new_mb):
+        """Grow a running job's reservation when it uses more than estimated"""
+        with self._condition:
+            with self._shared():
+                self.reserved_mb += new_mb - old_mb
+            self._condition.notify_all()
+
+    def release(self, amount_mb):
+        with self._condition:
+            with self._shared():
+                self.reserved_mb -= amount_mb
+                self.running -= 1
+            self._condition.notify_all()
+
+    def stats(self, label="render"):
+        """
+        Waiting jobs and admission wait percentiles (seconds) for one kind of render.
+
+        Returns:
+            dict: {priority name: {"queued", "p50", "p90", "p99"}}
+        """
+        with self._condition:
+            waiting = [ticket for ticket in self._waiting if ticket[3] == label]
+            waits = {key: sorted(samples) for key, samples in self._waits.items()}
+
+        result = {}
+        for priority, priority_name in PRIORITY_NAMES.items():
+            entry = {"queued": sum(1 for ticket in waiting if ticket[0] == priority)}
+            entry.update(wait_percentiles(waits.get((label, priority), [])))
+            result[priority_name] = entry
+        return result
+
+
+# Shared by every render in this process and, through SHARED_BUDGET_PATH, with
+# other processes on this host, so concurrent lessons respect it too
+MEMORY_BUDGET = MemoryBudget(RENDER_MEMORY_BUDGET_MB, RENDER_WORKERS, SHARED_BUDGET_PATH)
+_history_lock = threading.Lock()
+
+
+def lesson_sections(script_data):
+    """
+    Return the section scene names (see musical_math_lesson.py) a lesson needs, in order.
+
+    Sections the full MusicalMathLesson would skip are left out, since Manim
+    produces no video for a scene without animations.
+    """
+    sections = ["TitleSection", "IntroSection"]
+    if script_data.get('key_points'):
+        sections.append("KeyPointsSection")
+    for i in range(len(script_data.get('examples', [])[:2])):
+        sections.append(f"Example{i + 1}Section")
+    if script_data.get('lyrics'):
+        sections.append("MusicalSection")
+    sections.extend(["SummarySection", "EndScreenSection"])
+    return sections
+
+
+def section_text(script_data, section):
+    """Return the lesson text a section puts on screen, which drives its memory use"""
+    if section == "TitleSection":
+        return script_data.get('title', '') + script_data.get('concept', '')
+    if section == "IntroSection":
+        return '. '.join(script_data.get('narrator_script', '').split('.')[:2])
+    if section == "KeyPointsSection":
+        return ''.join(script_data.get('key_points', [])[:4])
+    if section.startswith("Example"):
+        example = script_data.get('examples', [])[int(section[len("Example")]) - 1]
+        return example.get('problem', '') + example.get('solution', '')
+    if section == "MusicalSection":
+        return script_data.get('lyrics', '')[:200]
+    if section == "SummarySection":
+        return ''.join(script_data.get('key_points', [])[:3])
+    return ''
+
+
+def load_memory_history():
+    """Load measured render peaks and per-quality correction factors"""
+    try:
+        with open(MEMORY_HISTORY_PATH, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"scales": {}, "jobs": []}
+
+
+def _history_key(quality, slide):
+    """Correction factors are learned per quality and render mode; stills peak far lower than videos"""
+    return f"{quality}-s" if slide else quality
+
+
+def estimate_render_memory(script_data, section, quality="-ql", slide=False):
+    """
+    Estimate the peak memory (MB) of rendering one section.
+
+    The raw estimate grows with quality and on-screen text; it is multiplied by
+    the ratio of measured to estimated peaks seen for that quality and mode
+    (video or `slide` still) so far.
+
+    Returns:
+        tuple: (raw estimate, calibrated estimate) in MB
+    """
+    raw_mb = BASE_MEMORY_MB.get(quality, BASE_MEMORY_MB["-qh"])
+    raw_mb += MEMORY_PER_KCHAR_MB * len(section_text(script_data, section)) / 1000
+    scale = load_memory_history()["scales"].get(_history_key(quality, slide), {}).get("scale", 1.0)
+    return raw_mb, int(raw_mb * scale)
+
+
+def record_render_memory(section, quality, raw_mb, estimate_mb, peak_mb, slide=False):
+    """Store a job's measured peak and update the correction factor of its quality and mode"""
+    # The file lock keeps samples from renders in other processes too
+    with _history_lock, _locked_file(MEMORY_HISTORY_PATH + ".lock"):
+        history = load_memory_history()
+        stats = history["scales"].setdefault(_history_key(quality, slide), {"scale": 1.0, "samples": 0})
+        ratio = peak_mb / raw_mb
+        # Exponential moving average, so recent renders count the most
+        stats["scale"] = ratio if stats["samples"] == 0 else 0.7 * stats["scale"] + 0.3 * ratio
+        stats["samples"] += 1
+        history["jobs"].append({
+            "section": section,
+            "quality": quality,
+            "slide": slide,
+            "estimate_mb": estimate_mb,
+            "peak_mb": peak_mb,
+            "finished_at": time.time(),
+        })
+        history["jobs"] = history["jobs"][-MEMORY_HISTORY_LIMIT:]
+
+        os.makedirs(os.path.dirname(MEMORY_HISTORY_PATH), exist_ok=True)
+        tmp_path = MEMORY_HISTORY_PATH + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(history, f)
+        os.replace(tmp_path, MEMORY_HISTORY_PATH)
+
+
+def process_tree_rss_mb(pid):
+    """
+    Resident memory (MB) of a process and all its descendants, read from /proc.
+
+    Returns None where /proc is unavailable (non-Linux hosts).
+    """
+    total_pages = 0
+    pending = [pid]
+    try:
+        page_size = os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/statm", 'r') as f:
+                total_pages += int(f.read().split()[1])
+            with open(f"/proc/{current}/task/{current}/children", 'r') as f:
+                pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            if current == pid:
+                return None
+    return total_pages * page_size / (1024 * 1024)
+
+
+def find_rendered_video(scene_name, media_dir="media"):
+    """Locate the video Manim wrote for a scene, whatever quality folder it used"""
+    pattern = os.path.join(media_dir, "videos", os.path.splitext(SCENE_FILE)[0], "*", f"{scene_name}.mp4")
+    matches = glob.glob(pattern)
+    if not matches:
+        return None
+    return max(matches, key=os.path.getmtime)
+
+
+def find_rendered_image(scene_name, media_dir="media"):
+    """Locate the image `manim -s` saved for a scene (its name carries the Manim version)"""
+    pattern = os.path.join(media_dir, "images", os.path.splitext(SCENE_FILE)[0], f"{scene_name}*.png")
+    matches = glob.glob(pattern)
+    if not matches:
+        return None
+    return max(matches, key=os.path.getmtime)
+
+
+def _run_with_admission(command, env, script_data, section, quality, priority, slide=False, cancel=None,
+                        deadline=None):
+    """
+    Run a render process once the memory budget admits it, tracking its peak RSS.
+
+    If `cancel` is set first, the process never starts or is terminated.
+
+    Returns:
+        tuple: (return code, captured stderr); return code is None when cancelled.
+    """
+    raw_mb, estimate_mb = estimate_render_memory(script_data, section, quality, slide)
+    label = "slides" if slide else "render"
+    if (cancel is not None and cancel.is_set()) or \
+            not MEMORY_BUDGET.acquire(estimate_mb, priority, cancel, deadline, label):
+        return None, ""
+    reserved_mb = estimate_mb
+    peak_mb = None
+    try:
+        if cancel is not None and cancel.is_set():
+            return None, ""
+        # stderr goes to a file: Manim's progress output would fill a pipe we only read at the end
+        with tempfile.TemporaryFile('w+') as stderr_file:
+            process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=stderr_file, text=True, env=env)
+            while process.poll() is None:
+                if cancel is not None and cancel.is_set():
+                    process.terminate()
+                    try:
+                        process.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+                        process.wait()
+                    return None, ""
+                rss_mb = process_tree_rss_mb(process.pid)
+                if rss_mb is not None:
+                    peak_mb = max(peak_mb or 0, rss_mb)
+                    if rss_mb > reserved_mb:
+                        MEMORY_BUDGET.resize(reserved_mb, rss_mb)
+                        reserved_mb = rss_mb
+                time.sleep(MEMORY_SAMPLE_INTERVAL)
+            stderr_file.seek(0)
+            stderr = stderr_file.read()
+    finally:
+        MEMORY_BUDGET.release(reserved_mb)
+
+    if process.returncode == 0 and peak_mb:
+        record_render_memory(section, quality, raw_mb, estimate_mb, int(peak_mb), slide)
+    return process.returncode, stderr
+
+
+def render_scene(script_data, scene_name, quality="-ql", media_dir="media", static_holds=True, priority=BATCH,
+                 cancel=None, deadline=None):
+    """
+    Render one scene of musical_math_lesson.py in its own Manim process.
+
+    The process only starts once the shared memory budget has room for its
+    estimated peak, see MemoryBudget. The scene reads the lesson content that
+    render_lesson() wrote into `media_dir`.
+
+    Args:
+        script_data (dict): Lesson content, used to estimate memory use.
+        scene_name (str): Scene class to render.
+        quality (str): Manim quality flag, e.g. "-ql".
+        media_dir (str): Manim media directory.
+        static_holds (bool): Render holds as single frames and expand them afterwards.
+        priority (int): scheduler.INTERACTIVE or scheduler.BATCH, for admission order.
+        cancel (threading.Event): Stop waiting or rendering once it is set.
+        deadline (float): time.monotonic() deadline of the lesson, for admission order.
+
+    Returns:
+        str: Path of the rendered (and hold-expanded) video, None on failure or cancellation.
+    """
+    manim_command = ["manim", quality, "--media_dir", media_dir, SCENE_FILE, scene_name]
+
+    render_env = os.environ.copy()
+    render_env["LESSON_CONTENT_PATH"] = os.path.join(media_dir, "lesson_content.json")
+    hold_plan_dir = os.path.join(media_dir, "holds")
+    hold_plan_path = os.path.join(hold_plan_dir, f"{scene_name}.json")
+    if static_holds:
+        os.makedirs(hold_plan_dir, exist_ok=True)
+        if os.path.exists(hold_plan_path):
+            os.remove(hold_plan_path)
+        render_env["HOLD_PLAN_DIR"] = hold_plan_dir
+
+    returncode, stderr = _run_with_admission(manim_command, render_env, script_data, scene_name, quality, priority,
+                                             cancel=cancel, deadline=deadline)
+    if returncode is None:
+        return None
+    if returncode != 0:
+        print(f"❌ Manim rendering of {scene_name} failed: {stderr}")
+        return None
+
+    video_path = find_rendered_video(scene_name, media_dir)
+    if not video_path:
+        print(f"❌ Could not find rendered video for {scene_name}")
+        return None
+
+    if static_holds:
+        sections_dir = os.path.join(media_dir, "sections")
+        os.makedirs(sections_dir, exist_ok=True)
+        video_path = expand_static_holds(video_path, hold_plan_path, os.path.join(sections_dir, f"{scene_name}.mp4"))
+
+    return video_path
+
+
+def render_lesson(script_data, output_path, quality="-ql", media_dir="media", static_holds=True,
+                  priority=BATCH, on_section_ready=None, deadline=None):
+    """
+    Render every section of a lesson concurrently and join them in order.
+
+    Sections are independent Manim scenes, so render latency is roughly that of
+    the longest section when enough workers are available. How many actually
+    run at once is decided by MEMORY_BUDGET, shared with every other lesson.
+
+    As soon as one section fails, the others stop waiting for admission and
+    running renders are terminated, so a failed lesson frees its share of the
+    budget right away.
+
+    Args:
+        on_section_ready (callable): Called with each section's video path in
+            playback order, as soon as it and every section before it are done.
+            Returning a falsy value fails the lesson.
+        output_path (str): Where to join the sections. None skips the join,
+            for callers that only need the sections (e.g. HLS streaming).
+
+    Returns:
+        str: The output path if successful (or True when `output_path` is
+        None), None otherwise.
+    """
+    os.makedirs(media_dir, exist_ok=True)
+    with open(os.path.join(media_dir, "lesson_content.json"), 'w') as f:
+        json.dump(script_data, f)
+
+    sections = lesson_sections(script_data)
+    print(f"🎬 Rendering {len(sections)} sections...")
+
+    cancel = threading.Event()
+    section_videos = []
+    with ThreadPoolExecutor(max_workers=len(sections)) as pool:
+        futures = [
+            pool.submit(render_scene, script_data, name, quality, media_dir, static_holds, priority, cancel, deadline)
+            for name in sections
+        ]
+        for future in futures:
+            future.add_done_callback(lambda done: _cancel_on_failure(done, cancel))
+        for future in futures:
+            video_path = future.result()
+            if not video_path or (on_section_ready and not on_section_ready(video_path)):
+                cancel.set()
+                return None
+            section_videos.append(video_path)
+
+    if output_path is None:
+        return True
+    return concatenate_videos(section_videos, output_path)
+
+
+def _cancel_on_failure(future, cancel):
+    """Done callback: cancel the rest of a lesson when one of its renders failed"""
+    if future.exception() is not None or not future.result():
+        cancel.set()
+
+
+def render_slide(script_data, scene_name, quality="-ql", media_dir="media", priority=BATCH, cancel=None,
+                 deadline=None):
+    """
+    Render one section as a single still image with `manim -s`.
+
+    Animations are skipped rather than drawn, and SLIDES_MODE makes the image
+    show the section at its last hold, so a slide costs a fraction of a video.
+
+    Returns:
+        str: Path of the image, None on failure.
+    """
+    manim_command = ["manim", quality, "-s", "--media_dir", media_dir, SCENE_FILE, scene_name]
+
+    render_env = os.environ.copy()
+    render_env["LESSON_CONTENT_PATH"] = os.path.join(media_dir, "lesson_content.json")
+    render_env["SLIDES_MODE"] = "1"
+
+    returncode, stderr = _run_with_admission(manim_command, render_env, script_data, scene_name, quality, priority,
+                                             slide=True, cancel=cancel, deadline=deadline)
+    if returncode is None:
+        return None
+    if returncode != 0:
+        print(f"❌ Manim rendering of the {scene_name} slide failed: {stderr}")
+        return None
+
+    image_path = find_rendered_image(scene_name, media_dir)
+    if not image_path:
+        print(f"❌ Could not find rendered slide for {scene_name}")
+        return None
+    return image_path
+
+
+def render_lesson_slides(script_data, quality="-ql", media_dir="media", priority=BATCH, deadline=None):
+    """
+    Render one still per lesson section, concurrently.
+
+    Returns:
+        list: (section name, image path) pairs in playback order, None on failure.
+    """
+    os.makedirs(media_dir, exist_ok=True)
+    with open(os.path.join(media_dir, "lesson_content.json"), 'w') as f:
+        json.dump(script_data, f)
+
+    sections = lesson_sections(script_data)
+    print(f"🖼️ Rendering {len(sections)} slides...")
+
+    # One failed slide cancels the rest, as in render_lesson()
+    cancel = threading.Event()
+    with ThreadPoolExecutor(max_workers=len(sections)) as pool:
+        futures = [
+            pool.submit(render_slide, script_data, name, quality, media_dir, priority, cancel, deadline)
+            for name in sections
+        ]
+        for future in futures:
+            future.add_done_callback(lambda done: _cancel_on_failure(done, cancel))
+        images = [future.result() for future in futures]
+
+    if not all(images):
+        return None
+    return list(zip(sections, images))
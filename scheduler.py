@@ -0,0 +1,234 @@
+# File: scheduler.py
+
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+
+# Lower value = served first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# How many recent queue waits per stage and priority are kept for percentiles
+WAIT_SAMPLES = 1000
+
+
+def wait_percentiles(samples):
+    """p50/p90/p99 of sorted wait samples (seconds), None when there are none"""
+    return {
+        label: samples[min(int(fraction * len(samples)), len(samples) - 1)] if samples else None
+        for label, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+    }
+
+
+class DeadlineExceeded(Exception):
+    """Raised for a job whose deadline passed before it reached a stage"""
+
+
+class Deferred(Exception):
+    """Raised by a stage to run the job's current stage again after `delay` seconds"""
+
+    def __init__(self, delay, reason):
+        super().__init__(reason)
+        self.delay = delay
+
+
+class Job:
+    """A lesson moving through the pipeline stages, sharing one context dict"""
+
+    def __init__(self, name, context, priority, deadline):
+        self.name = name
+        self.context = context
+        self.priority = priority
+        self.deadline = deadline
+        self.route = None
+        self.stage_index = 0
+        self.enqueued_at = None
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    def finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the job leaves the pipeline and return its result (None on failure)"""
+        self._done.wait(timeout)
+        return self.result
+
+
+class PipelineScheduler:
+    """
+    Runs jobs through a fixed list of stages, each with its own worker threads.
+
+    Every stage keeps a priority queue ordered by (priority, deadline, arrival),
+    so an interactive job jumps ahead of any queued batch job at each stage it
+    reaches, and jobs with earlier deadlines go first within a class. Workers
+    never sit idle while anything is queued, so batch work uses all capacity
+    interactive work leaves free.
+
+    A stage with no worker count is unbounded: each job starts it on its own
+    thread as soon as it arrives. Use this for stages that limit themselves,
+    like rendering, which admits sections through the render memory budget in
+    priority order; a fixed worker pool in front of it would make interactive
+    jobs wait for whole batch lessons to finish.
+
+    Jobs pass through every stage in order unless they are submitted with a
+    route, a subset of the stages; this keeps cheap jobs out of the queues of
+    stages they do not need.
+
+    A stage function takes the job context and returns True to continue to the
+    next stage or False to stop; the context's "result" is the job's result. It
+    may raise Deferred to park the job (e.g. during a provider outage) without
+    holding a worker; the job then rejoins the same stage's queue.
+    """
+
+    def __init__(self, stages, admission_stats=None):
+        """
+        Args:
+            stages (list): (name, function, worker count) tuples, in pipeline order.
+                A worker count of None makes the stage unbounded.
+            admission_stats (dict): For unbounded stages that queue work
+                themselves, stage name -> callable returning that queue's
+                {priority name: {"queued", "p50", "p90", "p99"}}; stats()
+                reports it instead of the stage's (always empty) queue.
+        """
+        self.stages = stages
+        self.admission_stats = admission_stats or {}
+        self._queues = [[] for _ in stages]
+        self._condition = threading.Condition()
+        self._sequence = itertools.count()
+        self._deferred = {(name, priority): 0 for name, _, _ in stages for priority in PRIORITY_NAMES}
+        self._waits = {
+            (name, priority): deque(maxlen=WAIT_SAMPLES)
+            for name, _, _ in stages for priority in PRIORITY_NAMES
+        }
+
+        for stage_index, (name, _, workers) in enumerate(stages):
+            for n in range(workers or 0):
+                thread = threading.Thread(target=self._worker, args=(stage_index,), name=f"{name}-{n}", daemon=True)
+                thread.start()
+
+    def submit(self, name, context, priority=BATCH, deadline_seconds=None, route=None):
+        """
+        Queue a job at the first stage of its route.
+
+        Args:
+            name (str): Label used in status output.
+            context (dict): State handed to every stage function.
+            priority (int): INTERACTIVE or BATCH.
+            deadline_seconds (float): Give up on the job if it is still queued after this long.
+            route (list): Names of the stages to run, in pipeline order; all stages by default.
+
+        Returns:
+            Job: Handle to wait on.
+        """
+        deadline = time.monotonic() + deadline_seconds if deadline_seconds is not None else None
+        job = Job(name, context, priority, deadline)
+        stage_names = [stage_name for stage_name, _, _ in self.stages]
+        job.route = [stage_names.index(stage_name) for stage_name in route] if route else list(range(len(self.stages)))
+        job.stage_index = job.route[0]
+        self._enqueue(job)
+        return job
+
+    def _enqueue(self, job):
+        if self.stages[job.stage_index][2] is None:
+            job.enqueued_at = time.monotonic()
+            threading.Thread(target=self._run, args=(job.stage_index, job), daemon=True).start()
+            return
+        with self._condition:
+            job.enqueued_at = time.monotonic()
+            deadline = job.deadline if job.deadline is not None else float('inf')
+            heapq.heappush(self._queues[job.stage_index], (job.priority, deadline, next(self._sequence), job))
+            self._condition.notify_all()
+
+    def _defer(self, job, stage_name, delay):
+        key = (stage_name, job.priority)
+
+        def requeue():
+            with self._condition:
+                self._deferred[key] -= 1
+            self._enqueue(job)
+
+        with self._condition:
+            self._deferred[key] += 1
+        timer = threading.Timer(delay, requeue)
+        timer.daemon = True
+        timer.start()
+
+    def _worker(self, stage_index):
+        queue = self._queues[stage_index]
+        while True:
+            with self._condition:
+                while not queue:
+                    self._condition.wait()
+                job = heapq.heappop(queue)[-1]
+            self._run(stage_index, job)
+
+    def _run(self, stage_index, job):
+        """Run one job through one stage and pass it on"""
+        stage_name, stage_function, _ = self.stages[stage_index]
+        now = time.monotonic()
+        with self._condition:
+            self._waits[(stage_name, job.priority)].append(now - job.enqueued_at)
+
+        if job.deadline is not None and now > job.deadline:
+            print(f"⏰ '{job.name}' missed its deadline before {stage_name}")
+            job.finish(error=DeadlineExceeded(stage_name))
+            return
+
+        try:
+            proceed = stage_function(job.context)
+        except Deferred as e:
+            print(f"⏸️ '{job.name}' deferred for {e.delay:.0f}s at {stage_name}: {e}")
+            self._defer(job, stage_name, e.delay)
+            return
+        except Exception as e:
+            print(f"❌ Error in {stage_name} stage for '{job.name}': {e}")
+            job.finish(error=e)
+            return
+
+        step = job.route.index(stage_index) + 1
+        if not proceed:
+            job.finish()
+        elif step == len(job.route):
+            job.finish(result=job.context.get("result"))
+        else:
+            job.stage_index = job.route[step]
+            self._enqueue(job)
+
+    def stats(self):
+        """
+        Queue depth and wait-time percentiles (seconds) per stage and priority class.
+
+        Returns:
+            dict: {stage: {priority name: {"queued", "deferred", "p50", "p90", "p99"}}}
+        """
+        with self._condition:
+            depths = {
+                (stage_index, priority): sum(1 for entry in queue if entry[0] == priority)
+                for stage_index, queue in enumerate(self._queues) for priority in PRIORITY_NAMES
+            }
+            deferred = dict(self._deferred)
+            waits = {key: sorted(samples) for key, samples in self._waits.items()}
+
+        result = {}
+        for stage_index, (stage_name, _, _) in enumerate(self.stages):
+            admission = self.admission_stats[stage_name]() if stage_name in self.admission_stats else None
+            result[stage_name] = {}
+            for priority, priority_name in PRIORITY_NAMES.items():
+                if admission is not None:
+                    entry = dict(admission[priority_name])
+                else:
+                    entry = {"queued": depths[(stage_index, priority)]}
+                    entry.update(wait_percentiles(waits[(stage_name, priority)]))
+                entry["deferred"] = deferred[(stage_name, priority)]
+                result[stage_name][priority_name] = entry
+        return result
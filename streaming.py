@@ -0,0 +1,201 @@
+# File: streaming.py
+
+import os
+import json
+import time
+import shutil
+import tempfile
+
+from combiner import get_media_duration, mux_stream_segment, package_hls
+
+# Served as plain static files. Every publication gets its own directory,
+# streams/<lesson key>.<random>/, and streams/<lesson key> is a symlink to the
+# latest complete one, so republishing never pulls a stream from under a player.
+STREAMS_DIR = "streams"
+PLAYLIST_NAME = "index.m3u8"
+SOURCE_NAME = "source.json"
+
+# Declared maximum segment length. HLS forbids changing it while the playlist
+# grows, so it stays constant; lesson sections are well below it.
+HLS_TARGET_DURATION = int(os.getenv("HLS_TARGET_DURATION", 30))
+
+# Superseded or failed streams untouched for this long are no longer being watched
+STALE_STREAM_HOURS = float(os.getenv("STALE_STREAM_HOURS", 24))
+
+
+def _new_stream_dir(key):
+    os.makedirs(STREAMS_DIR, exist_ok=True)
+    return tempfile.mkdtemp(dir=STREAMS_DIR, prefix=f"{key}.")
+
+
+def _publish(key, output_dir, content_hash):
+    """
+    Record what a complete stream was made from and point streams/<key> at it.
+
+    Returns:
+        str: Playlist path under streams/<key>, or the stream's own playlist
+        path where symlinks are unavailable.
+    """
+    with open(os.path.join(output_dir, SOURCE_NAME), 'w') as f:
+        json.dump({"content_hash": content_hash, "published_at": time.time()}, f)
+
+    link_path = os.path.join(STREAMS_DIR, key)
+    tmp_link = link_path + ".swap"
+    try:
+        if os.path.lexists(tmp_link):
+            os.remove(tmp_link)
+        os.symlink(os.path.basename(output_dir), tmp_link)
+        if os.path.isdir(link_path) and not os.path.islink(link_path):
+            # A stream published before streams/<key> became a link
+            shutil.rmtree(link_path)
+        os.replace(tmp_link, link_path)
+    except OSError as e:
+        print(f"⚠️ Could not link {link_path} to the new stream: {e}")
+        return os.path.join(output_dir, PLAYLIST_NAME)
+    return os.path.join(link_path, PLAYLIST_NAME)
+
+
+def published_stream(key, content_hash):
+    """Playlist of the current complete stream of a lesson if it was made from `content_hash`, else None"""
+    link_path = os.path.join(STREAMS_DIR, key)
+    try:
+        with open(os.path.join(link_path, SOURCE_NAME), 'r') as f:
+            source = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if source.get("content_hash") != content_hash:
+        return None
+    return os.path.join(link_path, PLAYLIST_NAME)
+
+
+def publish_video(key, video_path, content_hash):
+    """
+    Publish an already rendered lesson video as a complete stream, without re-encoding.
+
+    Returns:
+        str: Playlist path, None on failure.
+    """
+    output_dir = _new_stream_dir(key)
+    if not package_hls(video_path, os.path.join(output_dir, PLAYLIST_NAME), HLS_TARGET_DURATION):
+        shutil.rmtree(output_dir, ignore_errors=True)
+        return None
+    return _publish(key, output_dir, content_hash)
+
+
+def prune_streams(max_age_days=None, dropped_keys=(), stale_hours=STALE_STREAM_HOURS):
+    """
+    Delete streams nobody should be watching any more.
+
+    Streams that are not the current one of their lesson (superseded or
+    failed) go once untouched for `stale_hours`; current streams go, with their
+    link, once published more than `max_age_days` ago or when their lesson is
+    in `dropped_keys`.
+
+    Returns:
+        int: Number of bytes freed.
+    """
+    if not os.path.isdir(STREAMS_DIR):
+        return 0
+
+    current = {}
+    for name in os.listdir(STREAMS_DIR):
+        path = os.path.join(STREAMS_DIR, name)
+        if os.path.islink(path):
+            current[os.readlink(path)] = name
+
+    now = time.time()
+    freed = 0
+    for name in os.listdir(STREAMS_DIR):
+        path = os.path.join(STREAMS_DIR, name)
+        if os.path.islink(path) or not os.path.isdir(path):
+            continue
+        files = [os.path.join(path, f) for f in os.listdir(path)]
+        newest = max([os.path.getmtime(path)] + [os.path.getmtime(f) for f in files])
+        if name in current:
+            expired = max_age_days is not None and now - newest >= max_age_days * 86400
+            if not expired and current[name] not in dropped_keys:
+                continue
+            os.remove(os.path.join(STREAMS_DIR, current[name]))
+        elif now - newest < stale_hours * 3600:
+            continue
+        freed += sum(os.path.getsize(f) for f in files)
+        shutil.rmtree(path, ignore_errors=True)
+    return freed
+
+
+class HlsPublisher:
+    """
+    Publishes a lesson as an HLS stream one section at a time.
+
+    Each rendered section is muxed with its slice of the voiceover into a
+    segment and appended to an EVENT playlist right away, so players can start
+    while later sections are still rendering. finish() closes the playlist,
+    and must also be called when the lesson fails so players stop polling.
+    The stream lives in its own new directory; only a complete one replaces
+    the lesson's current stream.
+    """
+
+    def __init__(self, key, audio_path, content_hash=None):
+        self.key = key
+        self.audio_path = audio_path
+        self.content_hash = content_hash
+        self.output_dir = _new_stream_dir(key)
+        self.playlist_path = os.path.join(self.output_dir, PLAYLIST_NAME)
+        self.segments = []
+        self.position = 0.0
+
+    def add_section(self, video_path):
+        """
+        Mux the next section (in playback order) and publish it.
+
+        Returns:
+            str: Path of the new segment, None on failure.
+        """
+        duration = get_media_duration(video_path)
+        if duration is None:
+            return None
+
+        segment_name = f"segment_{len(self.segments):03d}.ts"
+        segment_path = os.path.join(self.output_dir, segment_name)
+        if not mux_stream_segment(video_path, self.audio_path, self.position, duration, segment_path):
+            return None
+
+        if duration > HLS_TARGET_DURATION:
+            print(f"⚠️ Section {video_path} is {duration:.1f}s, longer than HLS_TARGET_DURATION")
+        self.segments.append((segment_name, duration))
+        self.position += duration
+        self._write_playlist(finished=False)
+        return segment_path
+
+    def finish(self, complete=True):
+        """
+        Mark the stream as ended.
+
+        A complete stream becomes the lesson's current stream and the path under
+        streams/<key> is returned; an incomplete one is only ended, so players
+        stop polling, and its own playlist path is returned.
+        """
+        self._write_playlist(finished=True)
+        if not complete:
+            return self.playlist_path
+        return _publish(self.key, self.output_dir, self.content_hash)
+
+    def _write_playlist(self, finished):
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{HLS_TARGET_DURATION}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+        ]
+        for segment_name, duration in self.segments:
+            lines.append(f"#EXTINF:{duration:.3f},")
+            lines.append(segment_name)
+        if finished:
+            lines.append("#EXT-X-ENDLIST")
+
+        # Replace atomically so a player never reads a half-written playlist
+        tmp_path = self.playlist_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.playlist_path)
@@ -0,0 +1,80 @@
+# File: test_circuit_breaker.py
+
+import time
+import unittest
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+def fail():
+    raise RuntimeError("provider error")
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    """State transitions of one breaker, with a short reset period instead of a real outage"""
+
+    def setUp(self):
+        self.breaker = CircuitBreaker("Test", failure_threshold=2, slow_call_seconds=5, reset_seconds=0.1)
+
+    def trip(self):
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                self.breaker.call(fail)
+
+    def test_opens_after_consecutive_failures_and_fails_fast(self):
+        with self.assertRaises(RuntimeError):
+            self.breaker.call(fail)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+        with self.assertRaises(RuntimeError):
+            self.breaker.call(fail)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertTrue(self.breaker.is_open())
+
+        calls = []
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(calls.append, "reached")
+        self.assertEqual(calls, [])
+        self.assertGreater(self.breaker.retry_after(), 0)
+
+    def test_success_resets_the_failure_count(self):
+        with self.assertRaises(RuntimeError):
+            self.breaker.call(fail)
+        self.assertEqual(self.breaker.call(lambda: "ok"), "ok")
+        with self.assertRaises(RuntimeError):
+            self.breaker.call(fail)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_probe_closes_on_success(self):
+        self.trip()
+        time.sleep(0.15)
+        self.assertFalse(self.breaker.is_open())
+
+        def probe():
+            # Only one probe goes through while half-open
+            self.assertEqual(self.breaker.state, HALF_OPEN)
+            with self.assertRaises(CircuitOpenError):
+                self.breaker.call(lambda: "second probe")
+            return "ok"
+
+        self.assertEqual(self.breaker.call(probe), "ok")
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.retry_after(), 0)
+
+    def test_half_open_probe_failure_reopens(self):
+        self.trip()
+        time.sleep(0.15)
+        with self.assertRaises(RuntimeError):
+            self.breaker.call(fail)
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(lambda: "ok")
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker("Slow", failure_threshold=1, slow_call_seconds=0.01, reset_seconds=60)
+        self.assertEqual(breaker.call(lambda: time.sleep(0.05) or "late"), "late")
+        self.assertEqual(breaker.state, OPEN)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+# File: test_memory_budget.py
+
+import time
+import threading
+import unittest
+
+import renderer
+from renderer import MemoryBudget
+from scheduler import INTERACTIVE, BATCH
+
+
+class MemoryBudgetTest(unittest.TestCase):
+    """Admission order of a process-local budget, with plain threads standing in for renders"""
+
+    def setUp(self):
+        # Cancelled waiters are noticed by polling; keep the tests fast
+        self.poll_seconds = renderer.SHARED_BUDGET_POLL_SECONDS
+        renderer.SHARED_BUDGET_POLL_SECONDS = 0.05
+        self.admitted = []
+
+    def tearDown(self):
+        renderer.SHARED_BUDGET_POLL_SECONDS = self.poll_seconds
+
+    def start_waiter(self, budget, name, amount_mb, priority=BATCH, cancel=None, deadline=None):
+        """Acquire on a thread, recording the name once admitted; returns after it is queued"""
+        queued = sum(entry["queued"] for entry in budget.stats().values())
+        results = {}
+
+        def run():
+            results[name] = budget.acquire(amount_mb, priority, cancel, deadline)
+            if results[name]:
+                self.admitted.append(name)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        for _ in range(100):
+            if name in results or sum(entry["queued"] for entry in budget.stats().values()) > queued:
+                break
+            time.sleep(0.01)
+        return thread, results
+
+    def test_head_of_line_blocks_smaller_jobs_behind_it(self):
+        budget = MemoryBudget(100, 3)
+        self.assertTrue(budget.acquire(60))
+        big, _ = self.start_waiter(budget, "big", 60)
+        small, _ = self.start_waiter(budget, "small", 10)
+        time.sleep(0.1)
+        # "small" would fit, but may not overtake "big"
+        self.assertEqual(self.admitted, [])
+        self.assertEqual(budget.stats()["batch"]["queued"], 2)
+
+        budget.release(60)
+        big.join(5)
+        small.join(5)
+        self.assertEqual(self.admitted, ["big", "small"])
+        self.assertEqual(budget.reserved_mb, 70)
+        self.assertEqual(budget.stats()["batch"]["queued"], 0)
+
+    def test_interactive_then_deadline_order_within_batch(self):
+        budget = MemoryBudget(100, 1)
+        self.assertTrue(budget.acquire(10))
+        now = time.monotonic()
+        threads = [
+            self.start_waiter(budget, "batch", 10)[0],
+            self.start_waiter(budget, "batch-deadline", 10, deadline=now + 60)[0],
+            self.start_waiter(budget, "interactive", 10, INTERACTIVE)[0],
+        ]
+        self.assertEqual(budget.stats()["interactive"]["queued"], 1)
+
+        for _ in threads:
+            budget.release(10)
+            for _ in range(100):
+                if budget.running:
+                    break
+                time.sleep(0.01)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(self.admitted, ["interactive", "batch-deadline", "batch"])
+
+    def test_oversized_job_runs_alone(self):
+        budget = MemoryBudget(100, 2)
+        self.assertTrue(budget.acquire(500))
+        waiter, _ = self.start_waiter(budget, "next", 10)
+        time.sleep(0.1)
+        self.assertEqual(self.admitted, [])
+        budget.release(500)
+        waiter.join(5)
+        self.assertEqual(self.admitted, ["next"])
+
+    def test_cancelled_waiter_leaves_the_queue_and_unblocks_the_next(self):
+        budget = MemoryBudget(100, 2)
+        self.assertTrue(budget.acquire(80))
+        cancel = threading.Event()
+        blocked, results = self.start_waiter(budget, "cancelled", 80, cancel=cancel)
+        behind, _ = self.start_waiter(budget, "behind", 10)
+        time.sleep(0.1)
+        self.assertEqual(self.admitted, [])
+
+        cancel.set()
+        blocked.join(5)
+        behind.join(5)
+        self.assertFalse(results["cancelled"])
+        self.assertEqual(self.admitted, ["behind"])
+        self.assertEqual(budget.reserved_mb, 90)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+# File: test_scheduler.py
+
+import time
+import threading
+import unittest
+
+from scheduler import PipelineScheduler, Deferred, DeadlineExceeded, INTERACTIVE, BATCH
+
+
+class PipelineSchedulerTest(unittest.TestCase):
+    """Queue order, deadlines and deferrals of a one-worker pipeline, with no real stages"""
+
+    def setUp(self):
+        self.gate = threading.Event()
+        self.order = []
+
+    def blocking_stage(self, ctx):
+        if ctx["name"] == "blocker":
+            self.gate.wait(5)
+        else:
+            self.order.append(ctx["name"])
+        ctx["result"] = ctx["name"]
+        return True
+
+    def submit_behind_blocker(self, scheduler, jobs):
+        """Occupy the only worker, queue `jobs` as (name, priority, deadline seconds), then let it go"""
+        blocker = scheduler.submit("blocker", {"name": "blocker"}, BATCH)
+        time.sleep(0.05)
+        handles = [scheduler.submit(name, {"name": name}, priority, deadline) for name, priority, deadline in jobs]
+        self.gate.set()
+        blocker.wait(5)
+        return handles
+
+    def test_interactive_jumps_queued_batch_and_deadlines_order_within_class(self):
+        scheduler = PipelineScheduler([("work", self.blocking_stage, 1)])
+        handles = self.submit_behind_blocker(scheduler, [
+            ("batch-1", BATCH, None),
+            ("batch-deadline", BATCH, 60),
+            ("interactive", INTERACTIVE, None),
+            ("batch-2", BATCH, None),
+        ])
+        for job in handles:
+            job.wait(5)
+        self.assertEqual(self.order, ["interactive", "batch-deadline", "batch-1", "batch-2"])
+
+    def test_job_past_its_deadline_is_dropped_before_the_stage(self):
+        scheduler = PipelineScheduler([("work", self.blocking_stage, 1)])
+        self.gate.clear()
+        blocker = scheduler.submit("blocker", {"name": "blocker"}, BATCH)
+        time.sleep(0.05)
+        late = scheduler.submit("late", {"name": "late"}, BATCH, deadline_seconds=0.01)
+        time.sleep(0.05)
+        self.gate.set()
+        blocker.wait(5)
+
+        self.assertIsNone(late.wait(5))
+        self.assertIsInstance(late.error, DeadlineExceeded)
+        self.assertEqual(self.order, [])
+
+    def test_deferred_job_rejoins_its_stage(self):
+        attempts = []
+
+        def flaky_stage(ctx):
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise Deferred(0.1, "provider is down")
+            ctx["result"] = "done"
+            return True
+
+        scheduler = PipelineScheduler([("flaky", flaky_stage, 1), ("after", lambda ctx: True, 1)])
+        job = scheduler.submit("lesson", {}, BATCH)
+        time.sleep(0.05)
+        self.assertEqual(scheduler.stats()["flaky"]["batch"]["deferred"], 1)
+
+        self.assertEqual(job.wait(5), "done")
+        self.assertEqual(len(attempts), 2)
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.1)
+        self.assertEqual(scheduler.stats()["flaky"]["batch"]["deferred"], 0)
+
+    def test_route_skips_stages_and_unbounded_stage_runs_every_job(self):
+        visited = []
+
+        def stage(name):
+            def run(ctx):
+                visited.append(name)
+                ctx["result"] = name
+                return True
+            return run
+
+        scheduler = PipelineScheduler([("a", stage("a"), 1), ("b", stage("b"), None), ("c", stage("c"), 1)])
+        job = scheduler.submit("lesson", {}, BATCH, route=["a", "c"])
+        self.assertEqual(job.wait(5), "c")
+        self.assertEqual(visited, ["a", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
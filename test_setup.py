@@ -40,9 +40,10 @@ def test_dependencies():
     return len(missing) == 0
 
 def test_system_tools():
-    """Test system tools like FFmpeg and Manim CLI"""
+    """Test system tools like FFmpeg, FFprobe and Manim CLI"""
     tools = {
         'ffmpeg': ['ffmpeg', '-version'],
+        'ffprobe': ['ffprobe', '-version'],
         'manim': ['manim', '--version']
     }
     
@@ -0,0 +1,116 @@
+# File: warmup.py
+
+import sys
+import time
+import argparse
+
+from generate_content import get_math_concepts_by_category
+from pipeline import submit_lesson, cached_lesson_video
+from scheduler import BATCH
+
+
+def catalog_entries(grade_levels=None):
+    """
+    List (concept, grade level) pairs from the concept catalog.
+
+    Args:
+        grade_levels (list): Catalog grades to include, e.g. ["High School"];
+            all grades when empty. Matching is case-insensitive.
+    """
+    wanted = {g.lower() for g in grade_levels} if grade_levels else None
+    entries = []
+    for grade, categories in get_math_concepts_by_category().items():
+        if wanted and grade.lower() not in wanted:
+            continue
+        for concept_list in categories.values():
+            for concept in concept_list:
+                entries.append((concept, grade.lower()))
+    return entries
+
+
+def warm_catalog(grade_levels=None, lessons_per_minute=4, max_in_flight=4):
+    """
+    Pregenerate content, voiceovers and videos for every catalog concept.
+
+    Concepts that already have a fresh final video are skipped. The rest are
+    queued as batch work, so interactive requests still go first, no faster
+    than `lessons_per_minute` (each new lesson costs one Gemini and one
+    ElevenLabs request) and with at most `max_in_flight` lessons in the pipeline.
+
+    Run it from the main.py menu so it shares that process's scheduler and
+    interactive lessons really go first. Run standalone, it still shares the
+    host's render memory budget with other processes, but not their priorities.
+
+    Returns:
+        dict: Lists of "skipped", "generated" and "failed" (concept, grade level) pairs.
+    """
+    if lessons_per_minute <= 0:
+        raise ValueError("lessons_per_minute must be positive")
+    entries = catalog_entries(grade_levels)
+    pending, skipped = [], []
+    for concept, grade in entries:
+        (skipped if cached_lesson_video(concept, grade) else pending).append((concept, grade))
+    print(f"🔥 Warming {len(pending)} of {len(entries)} catalog lessons ({len(skipped)} already fresh)")
+
+    interval = 60 / lessons_per_minute
+    in_flight = []
+    generated, failed = [], []
+
+    def collect(job):
+        entry = (job.context["concept"], job.context["grade_level"])
+        (generated if job.wait() else failed).append(entry)
+
+    for i, (concept, grade) in enumerate(pending, 1):
+        while len(in_flight) >= max_in_flight:
+            collect(in_flight.pop(0))
+        print(f"\n{'='*20} Warm-up {i}/{len(pending)}: {concept} ({grade}) {'='*20}")
+        in_flight.append(submit_lesson(concept, grade, priority=BATCH))
+        if i < len(pending):
+            time.sleep(interval)
+
+    for job in in_flight:
+        collect(job)
+
+    return {"skipped": skipped, "generated": generated, "failed": failed}
+
+
+def report_warmup(result):
+    """Print the outcome of warm_catalog()"""
+    print(f"\n🎉 WARM-UP COMPLETE!")
+    print(f"♻️ Already fresh: {len(result['skipped'])} lessons")
+    print(f"✅ Generated: {len(result['generated'])} lessons")
+    print(f"❌ Failed: {len(result['failed'])} lessons")
+    for concept, grade in result["failed"]:
+        print(f"  • {concept} ({grade})")
+
+
+def _positive(value):
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError("must be greater than 0")
+    return number
+
+
+def _positive_int(value):
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError("must be greater than 0")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pregenerate lessons for the concept catalog")
+    parser.add_argument("--grade-level", action="append", dest="grade_levels",
+                        help="Catalog grade to warm (repeatable): Elementary, Middle School, High School")
+    parser.add_argument("--per-minute", type=_positive, default=4, help="Maximum new lessons started per minute")
+    parser.add_argument("--max-in-flight", type=_positive_int, default=4,
+                        help="Maximum lessons in the pipeline at once")
+    args = parser.parse_args()
+
+    result = warm_catalog(args.grade_levels, args.per_minute, args.max_in_flight)
+    report_warmup(result)
+    return 0 if not result["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())